@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ==============================================================================
+# Cache für bereits verifizierte Tokens
+# ==============================================================================
+class PrincipalCache:
+    """
+    Begrenzter LRU-Cache Token -> Benutzer. Ein Eintrag gilt bis zum `exp` des
+    Tokens und wird bei Änderungen am Benutzer sofort verworfen.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()  # token -> (user, exp)
+        self._tokens_by_user: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        """Liefert den Benutzer zum Token oder None, wenn nicht (mehr) im Cache."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user, exp = entry
+            if exp is not None and exp <= time.time():
+                self._remove(token)
+                return None
+            self._entries.move_to_end(token)
+            return user
+
+    def put(self, token: str, user, exp: float | None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (user, exp)
+            self._tokens_by_user.setdefault(user.username.lower(), set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, username: str):
+        """Verwirft alle Einträge eines Benutzers (Groß-/Kleinschreibung egal)."""
+        with self._lock:
+            for token in self._tokens_by_user.pop(username.lower(), ()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, token: str):
+        user, _ = self._entries.pop(token)
+        key = user.username.lower()
+        tokens = self._tokens_by_user.get(key)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[key]
@@ -0,0 +1,92 @@
+"""
+Benchmark für den Suchindex (search.py).
+
+Erzeugt einen synthetischen Fehlerkatalog, baut den Index auf und misst die
+Latenz pro Anfrage für eine Tipp-Sequenz ("search as you type") im Vergleich
+zum früheren linearen Teilstring-Scan.
+
+Aufruf:
+    python benchmarks/bench_search.py --entries 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import SearchIndex
+
+WORDS = [
+    "memory", "cycle", "watchdog", "timeout", "module", "communication", "firmware",
+    "configuration", "profinet", "profisafe", "voltage", "process", "sensor", "analog",
+    "digital", "output", "input", "overflow", "underflow", "short-circuit", "checksum",
+    "parameter", "internal", "error", "driver", "installation", "boot", "project",
+    "plc", "cpu", "task", "iec", "card", "ethernet", "buffer", "diagnosis", "wire",
+]
+
+QUERIES = ["watchdog", "profinet con", "volt", "sd card", "cheksum", "firmwre versoin", "short-circuit at"]
+
+
+def make_catalog(size: int, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    entries = set()
+    while len(entries) < size:
+        words = rng.sample(WORDS, rng.randint(3, 8))
+        entries.add(f"{' '.join(words).capitalize()} (code {rng.randint(1000, 99999)})")
+    return list(entries)
+
+
+def typing_sequence(query: str) -> list[str]:
+    # Das Frontend sucht erst ab zwei Zeichen
+    return [query[:n] for n in range(2, len(query) + 1)]
+
+
+def linear_scan(entries, query):
+    return [e for e in entries if query.lower() in e.lower()]
+
+
+def measure(fn, queries, repeat):
+    timings = []
+    for _ in range(repeat):
+        for q in queries:
+            start = time.perf_counter()
+            fn(q)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "p50": timings[len(timings) // 2] * 1000,
+        "p95": timings[int(len(timings) * 0.95)] * 1000,
+        "max": timings[-1] * 1000,
+        "mean": statistics.fmean(timings) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--skip-linear", action="store_true", help="Linearen Scan nicht messen")
+    args = parser.parse_args()
+
+    entries = make_catalog(args.entries)
+    start = time.perf_counter()
+    index = SearchIndex(entries)
+    print(f"Index aufgebaut: {len(index)} Einträge in {time.perf_counter() - start:.2f}s")
+
+    queries = [q for query in QUERIES for q in typing_sequence(query)]
+    results = {"index": measure(lambda q: index.search(q, limit=args.limit), queries, args.repeat)}
+    if not args.skip_linear:
+        results["linear"] = measure(lambda q: linear_scan(entries, q), queries, 1)
+
+    print(f"{len(queries)} Anfragen pro Durchlauf, Zeiten in ms")
+    print(f"{'Verfahren':<10} {'p50':>8} {'p95':>8} {'max':>8} {'mittel':>8}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['p50']:8.2f} {r['p95']:8.2f} {r['max']:8.2f} {r['mean']:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
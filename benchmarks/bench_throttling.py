@@ -0,0 +1,74 @@
+"""
+Mikro-Benchmark für throttling.py: Mehrkosten von Rate-Limit und Lastabwurf pro Anfrage.
+
+Gemessen wird direkt auf ASGI-Ebene (ohne HTTP-Client), damit die wenigen
+Mikrosekunden nicht im Rauschen untergehen:
+  - RateLimiter.acquire bei vielen verschiedenen Clients,
+  - eine minimale ASGI-Anwendung mit und ohne LoadShedder davor,
+  - die Prüfung in limit_search_rate (zwei Limiter) pro Suchanfrage.
+
+Aufruf:
+    python benchmarks/bench_throttling.py [--requests 200000]
+
+Das Verhalten (Burst, 429 bzw. 503 mit Retry-After) prüft tests/test_throttling.py.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from throttling import LoadShedder, RateLimiter
+
+
+async def _endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+async def time_app(app, requests: int) -> float:
+    """Sekunden pro Anfrage an eine ASGI-Anwendung."""
+    scope = {"type": "http", "method": "GET", "path": "/api/search_errors", "headers": []}
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(scope, _receive, _send)
+    return (time.perf_counter() - start) / requests
+
+
+def time_limiter(requests: int, clients: int) -> float:
+    # Hohe Rate: gemessen wird der Normalfall (Anfrage erlaubt)
+    limiter = RateLimiter("bench", rate=1e9, burst=1_000_000, maxsize=clients)
+    keys = [f"techniker{i:06d}" for i in range(clients)]
+    start = time.perf_counter()
+    for i in range(requests):
+        limiter.acquire(keys[i % clients])
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=10_000)
+    args = parser.parse_args()
+
+    acquire = time_limiter(args.requests, args.clients)
+    plain = asyncio.run(time_app(_endpoint, args.requests))
+    shed = asyncio.run(time_app(LoadShedder(_endpoint, max_in_flight=256), args.requests))
+    print(f"RateLimiter.acquire ({args.clients} Clients)  {acquire * 1e6:6.2f} µs")
+    print(f"Suche: IP- und Benutzer-Limiter         {2 * acquire * 1e6:6.2f} µs")
+    print(f"ASGI-Anwendung ohne LoadShedder         {plain * 1e6:6.2f} µs")
+    print(f"ASGI-Anwendung mit LoadShedder          {shed * 1e6:6.2f} µs  (+{(shed - plain) * 1e6:.2f} µs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Micro-Benchmark für die Benutzerverwaltung (database.py).
+
+Füllt das gewählte Speicher-Backend mit vielen Benutzern und misst get_user,
+add_user, update_user_data und delete_user. Das Verhalten selbst prüfen die
+Tests in tests/test_user_index.py.
+
+Beim JSON-Backend wird das Schreiben der Datei für die Messung abgeschaltet,
+da es unabhängig von der Benutzersuche ist.
+
+Aufruf:
+    python benchmarks/bench_users.py --users 50000 [--store sqlite]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import UserInDB
+from user_store import JsonUserStore, SqliteUserStore
+
+# Ein fester Hash genügt; bcrypt ist nicht Gegenstand dieser Messung
+HASH = "$2b$12$KIXQJQ6y0B2g5Ohy8Vd2UeC6p1CQ6pV1u5tQd0r1rj4k0o6HjvG2y"
+
+
+def open_store(kind: str):
+    directory = tempfile.mkdtemp()
+    if kind == "sqlite":
+        return SqliteUserStore(os.path.join(directory, "users.db"))
+    store = JsonUserStore(os.path.join(directory, "users.json"))
+    store._save = lambda: None
+    return store
+
+
+def populate(kind: str, count: int):
+    database._store = open_store(kind)
+    database._store.add_many([
+        {
+            "username": f"Worker{i:06d}", "full_name": None, "email": None,
+            "hashed_password": HASH, "role": "user", "disabled": False,
+        }
+        for i in range(count)
+    ])
+
+
+def timed(label: str, fn, repeat: int):
+    start = time.perf_counter()
+    for n in range(repeat):
+        fn(n)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} {elapsed / repeat * 1e6:10.1f} µs/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--store", choices=("json", "sqlite"), default="json")
+    args = parser.parse_args()
+
+    populate(args.store, args.users)
+    print(f"{args.users} Benutzer ({args.store})")
+    timed("get_user", lambda n: database.get_user(f"worker{n % args.users:06d}"), args.repeat)
+    timed("get_user (fehlt)", lambda n: database.get_user(f"missing{n}"), args.repeat)
+    timed("add_user", lambda n: database.add_user(UserInDB(username=f"Bench{n}", hashed_password=HASH, role="user")), args.repeat)
+    timed("update_user_data", lambda n: database.update_user_data(f"BENCH{n}", {"new_role": "admin"}), args.repeat)
+    timed("delete_user", lambda n: database.delete_user(f"bench{n}"), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
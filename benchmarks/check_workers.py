@@ -0,0 +1,202 @@
+"""
+Prüft die Konsistenz zwischen mehreren Worker-Prozessen (wie unter gunicorn).
+
+Jeder Worker ist ein eigener Prozess mit eigener Instanz der Anwendung
+(main.app) auf derselben Benutzerdatei bzw. -datenbank. Der steuernde Prozess
+ändert einen Benutzer; jeder Worker fragt mit dessen Token laufend eine
+geschützte Route ab und meldet, nach welcher Zeit die Änderung bei ihm gilt:
+  1. Beförderung zum Admin: /api/admin/check liefert 200 statt 403,
+  2. Löschen: /api/search_errors liefert 401 statt 200.
+Zusätzlich legen alle Worker gleichzeitig je einen Benutzer an; am Ende muss
+jeder Prozess alle sehen (keine verlorenen Schreibvorgänge).
+
+Erwartet wird eine Verzögerung unter USER_SYNC_INTERVAL + USER_DB_FLUSH_DELAY
+(plus Spielraum) und, dass die Datei nur nach tatsächlichen Änderungen und
+nicht bei jeder Anfrage neu gelesen wird. Bei einer Verletzung endet das
+Skript mit Exit-Code 1.
+
+Aufruf:
+    python benchmarks/check_workers.py --workers 4 --store json
+    python benchmarks/check_workers.py --workers 4 --store sqlite
+
+Als Test für beide Speicher: python -m pytest tests/test_workers.py
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+TARGET = "wechselnd"
+POLL_INTERVAL = 0.005
+
+
+def _count_file_reads(database):
+    """Zählt, wie oft der JSON-Speicher die Datei liest (nur Diagnose)."""
+    store = database._get_store()
+    counter = {"reads": 0}
+    if hasattr(store, "_read_file"):
+        original = store._read_file
+
+        def counting_read():
+            counter["reads"] += 1
+            return original()
+        store._read_file = counting_read
+    return counter
+
+
+def _wait_for_status(client, url, headers, expected, timeout) -> tuple[float | None, int]:
+    """Fragt url ab, bis der Status expected ist; liefert (Zeitpunkt, Anzahl Anfragen)."""
+    requests = 0
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        requests += 1
+        if client.get(url, headers=headers).status_code == expected:
+            return time.time(), requests
+        time.sleep(POLL_INTERVAL)
+    return None, requests
+
+
+def worker(number: int, workers: int, commands, results, timeout: float):
+    from fastapi.testclient import TestClient
+    import database
+    import main
+
+    reads = _count_file_reads(database)
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {main.create_access_token({'sub': TARGET})}"}
+    search = "/api/search_errors?query=sensor"
+    total_requests = 0
+
+    # Erst anfangen, wenn der Benutzer hier bekannt ist und noch kein Admin ist
+    _, n = _wait_for_status(client, "/api/admin/check", headers, 403, timeout)
+    total_requests += n
+    results.put(("ready", number))
+
+    assert commands.get() == "promoted"
+    seen_promoted, n = _wait_for_status(client, "/api/admin/check", headers, 200, timeout)
+    total_requests += n
+    results.put(("promoted", number, seen_promoted))
+
+    assert commands.get() == "deleted"
+    seen_deleted, n = _wait_for_status(client, search, headers, 401, timeout)
+    total_requests += n
+    results.put(("deleted", number, seen_deleted))
+
+    # Gleichzeitige Schreibvorgänge aus allen Workern
+    assert commands.get() == "add"
+    database.add_user(database.UserInDB(username=f"worker{number}", role="user", hashed_password="x"))
+    database._get_store().flush()
+    results.put(("added", number))
+
+    assert commands.get() == "count"
+    deadline = time.time() + timeout
+    while time.time() < deadline and any(database.get_user(f"worker{i}") is None for i in range(workers)):
+        time.sleep(POLL_INTERVAL)
+    visible = sum(database.get_user(f"worker{i}") is not None for i in range(workers))
+    results.put(("count", number, visible, total_requests, reads["reads"]))
+
+
+def collect(results, kind: str, count: int, timeout: float) -> list[tuple]:
+    items = []
+    while len(items) < count:
+        item = results.get(timeout=timeout)
+        assert item[0] == kind, f"erwartet {kind}, erhalten {item}"
+        items.append(item)
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--store", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--sync-interval", type=float, default=0.5, help="USER_SYNC_INTERVAL in Sekunden")
+    parser.add_argument("--flush-delay", type=float, default=0.2, help="USER_DB_FLUSH_DELAY in Sekunden")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--directory", help="Verzeichnis für Benutzerdatei und Metriken (Standard: temporär, wird gelöscht)")
+    args = parser.parse_args()
+
+    if args.directory:
+        run(args, args.directory)
+    else:
+        with tempfile.TemporaryDirectory(prefix="wartungshilfe-workers-", ignore_cleanup_errors=True) as directory:
+            run(args, directory)
+
+
+def run(args, directory: str):
+    os.environ.update({
+        "USER_STORE": args.store,
+        "USER_JSON_FILE": os.path.join(directory, "users.json"),
+        "USER_SQLITE_FILE": os.path.join(directory, "users.db"),
+        "USER_SYNC_INTERVAL": str(args.sync_interval),
+        "USER_DB_FLUSH_DELAY": str(args.flush_delay),
+        "METRICS_DIR": os.path.join(directory, "metrics"),
+        "BCRYPT_ROUNDS": "4",
+    })
+    import database
+    database.add_user(database.UserInDB(username=TARGET, role="user", hashed_password="x"))
+    database._get_store().flush()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    queues = [context.Queue() for _ in range(args.workers)]
+    processes = [
+        context.Process(target=worker, args=(i, args.workers, queues[i], results, args.timeout), daemon=True)
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def broadcast(command: str):
+        for queue in queues:
+            queue.put(command)
+
+    collect(results, "ready", args.workers, args.timeout)
+    bound = args.sync_interval + args.flush_delay + 0.5
+    problems = []
+
+    for kind, change in (("promoted", lambda: database.update_user_data(TARGET, {"new_role": "admin"})),
+                         ("deleted", lambda: database.delete_user(TARGET))):
+        change()
+        changed_at = time.time()
+        broadcast(kind)
+        delays = []
+        for _, number, seen_at in collect(results, kind, args.workers, args.timeout):
+            if seen_at is None:
+                problems.append(f"{kind}: Worker {number} hat die Änderung nie gesehen")
+            else:
+                delays.append(seen_at - changed_at)
+        if delays:
+            print(f"{kind:<9} sichtbar nach max. {max(delays) * 1000:7.1f} ms (Grenze {bound * 1000:.0f} ms)")
+            if max(delays) > bound:
+                problems.append(f"{kind}: Verzögerung {max(delays):.2f}s > {bound:.2f}s")
+
+    broadcast("add")
+    collect(results, "added", args.workers, args.timeout)
+    broadcast("count")
+    for _, number, visible, requests, reads in collect(results, "count", args.workers, args.timeout):
+        file_reads = f", {reads} Lesevorgänge der Datei" if args.store == "json" else ""
+        print(f"Worker {number}: {visible}/{args.workers} neue Benutzer sichtbar, {requests} Anfragen{file_reads}")
+        if visible != args.workers:
+            problems.append(f"Worker {number} sieht nur {visible} von {args.workers} neuen Benutzern")
+        # Pro Änderung höchstens wenige Lesevorgänge, nicht einer pro Anfrage
+        if args.store == "json" and reads > 4 * (args.workers + 2):
+            problems.append(f"Worker {number} hat die Datei {reads}-mal gelesen")
+
+    for process in processes:
+        process.join(timeout=5)
+
+    if problems:
+        print("\nFehler:")
+        for line in problems:
+            print("  " + line)
+        sys.exit(1)
+    print("\nÄnderungen kommen in allen Workern an.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Kaltstart-Budget: Importzeit von main und Latenz der ersten Anfragen.
+
+Jeder Durchlauf startet einen frischen Python-Prozess mit leerem
+Datenverzeichnis (wie ein neu gestarteter Worker oder eine neue Instanz) und misst:
+  - import main,
+  - die erste Anfrage auf /health, /api/search_errors, /api/all_errors und /,
+  - den ersten Login (enthält eine volle bcrypt-Prüfung; nur informativ).
+Mit --warm wird vorher main.warm_up() aufgerufen, wie im gunicorn-Master bei
+--preload; dann zählt die Aufwärmzeit nicht zum ersten Request.
+
+Liegt der Median über --import-budget-ms bzw. --request-budget-ms, endet das
+Skript mit Exit-Code 1.
+
+Aufruf:
+    python benchmarks/cold_start.py --runs 5
+    python benchmarks/cold_start.py --runs 5 --warm
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGETED_REQUESTS = ("GET /health", "GET /api/search_errors", "GET /api/all_errors", "GET /")
+
+
+def child(warm: bool):
+    """Läuft im frischen Prozess und gibt die Messwerte als JSON aus."""
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import main
+    timings = {"import main": time.perf_counter() - start}
+    if warm:
+        start = time.perf_counter()
+        main.warm_up()
+        timings["warm_up"] = time.perf_counter() - start
+
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {main.create_access_token({'sub': 'admin'})}"}
+    requests = (
+        ("GET /health", "GET", "/health", {}),
+        ("GET /api/search_errors", "GET", "/api/search_errors?query=sensor", {"headers": headers}),
+        ("GET /api/all_errors", "GET", "/api/all_errors", {"headers": headers}),
+        ("GET /", "GET", "/", {"headers": {"Accept-Encoding": "br, gzip"}}),
+        ("POST /api/login", "POST", "/api/login", {"data": {"username": "admin", "password": "Admin123"}}),
+    )
+    for name, method, url, kwargs in requests:
+        start = time.perf_counter()
+        response = client.request(method, url, **kwargs)
+        timings[name] = time.perf_counter() - start
+        assert response.status_code == 200, (name, response.status_code)
+    print(json.dumps(timings))
+
+
+def run_once(warm: bool) -> dict:
+    directory = tempfile.mkdtemp(prefix="wartungshilfe-cold-")
+    env = dict(os.environ,
+               USER_JSON_FILE=os.path.join(directory, "users.json"),
+               USER_SQLITE_FILE=os.path.join(directory, "users.db"),
+               METRICS_DIR=os.path.join(directory, "metrics"))
+    args = [sys.executable, os.path.abspath(__file__), "--child"] + (["--warm"] if warm else [])
+    output = subprocess.run(args, env=env, cwd=directory, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm", action="store_true", help="main.warm_up() vor den Anfragen aufrufen")
+    parser.add_argument("--import-budget-ms", type=float, default=1000)
+    parser.add_argument("--request-budget-ms", type=float, default=250, help="Budget je erster Anfrage (ohne Login)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.warm)
+        return
+
+    runs = [run_once(args.warm) for _ in range(args.runs)]
+    budgets = {"import main": args.import_budget_ms}
+    budgets.update({name: args.request_budget_ms for name in BUDGETED_REQUESTS})
+    problems = []
+    print(f"{'Schritt':<26} {'Median ms':>10} {'Max ms':>10} {'Budget ms':>10}")
+    for name in runs[0]:
+        values = [run[name] * 1000 for run in runs]
+        median = statistics.median(values)
+        budget = budgets.get(name)
+        print(f"{name:<26} {median:10.1f} {max(values):10.1f} {budget if budget is not None else '-':>10}")
+        if budget is not None and median > budget:
+            problems.append(f"{name}: {median:.1f} ms > {budget:.0f} ms")
+
+    if problems:
+        print("\nBudget überschritten:")
+        for line in problems:
+            print("  " + line)
+        sys.exit(1)
+    print("\nAlle Schritte innerhalb des Budgets.")
+
+
+if __name__ == "__main__":
+    main()
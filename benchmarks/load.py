@@ -0,0 +1,252 @@
+"""
+Last- und Latenz-Benchmark für die FastAPI-Anwendung (main.app).
+
+Die Anwendung läuft im selben Prozess und wird über einen ASGI-Transport
+(httpx) angesprochen, also ohne Netzwerk und ohne Server. Katalog und
+Benutzerbestand werden synthetisch in einem temporären Verzeichnis erzeugt.
+
+Jeder virtuelle Techniker führt eine realistische Mischung aus:
+  - Login,
+  - Suche während der Eingabe (eine Anfrage pro Tastendruck) auf /api/search_errors,
+  - Nachschlagen von Teilen und Schaltplänen (/api/parts, /api/schematic),
+  - gelegentliche Admin-Änderungen (Benutzer anlegen und ändern).
+
+Ausgegeben werden Durchsatz und p50/p95/p99-Latenz pro Route. Mit --baseline
+wird gegen einen gespeicherten Stand verglichen; bei einer Verschlechterung
+über --tolerance hinaus endet das Skript mit Exit-Code 1.
+
+Aufruf:
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/load.py --errors 20000 --users 5000 --baseline benchmarks/baseline.json
+    python benchmarks/load.py ... --write-baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = "Bench-Passwort-1"
+BASELINE_PARAMETERS = ("errors", "users", "store", "concurrency", "rounds", "admin_rounds", "bcrypt_rounds", "seed")
+
+
+# ==============================================================================
+# Testdaten
+# ==============================================================================
+def prepare_environment(args) -> str:
+    """Erzeugt Katalog und Benutzer und konfiguriert die Anwendung per Umgebung."""
+    from bench_search import make_catalog
+
+    directory = tempfile.mkdtemp(prefix="wartungshilfe-bench-")
+    catalog_path = os.path.join(directory, "error_catalog.json")
+    errors = make_catalog(args.errors, seed=args.seed)
+    with open(catalog_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "format": 1, "version": "bench",
+            "komponenten": ["Sensor", "Motor", "Pumpe", "Ventil", "Steuerung", "Relais", "Kabelbaum", "Netzteil"],
+            "errors": [[error, "Check module and wiring"] for error in errors],
+        }, f)
+
+    # Ein Hash für alle Benutzer genügt; bcrypt wird beim Login trotzdem voll gerechnet
+    from passlib.context import CryptContext
+    hashed = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.bcrypt_rounds).hash(PASSWORD)
+    users = {"admin": {"username": "admin", "email": None, "full_name": None, "disabled": False, "role": "admin", "hashed_password": hashed}}
+    for i in range(args.users):
+        name = f"techniker{i:06d}"
+        users[name] = {"username": name, "email": None, "full_name": None, "disabled": False, "role": "user", "hashed_password": hashed}
+    users_path = os.path.join(directory, "users.json")
+    with open(users_path, "w", encoding="utf-8") as f:
+        json.dump(users, f)
+
+    os.environ.update({
+        "CATALOG_FILE": catalog_path,
+        "CATALOG_RELOAD_INTERVAL": "0",
+        "USER_STORE": args.store,
+        "USER_JSON_FILE": users_path,
+        "USER_SQLITE_FILE": os.path.join(directory, "users.db"),
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        # Alle virtuellen Clients teilen sich eine Adresse; gemessen wird die Anwendung, nicht der Limiter
+        "LOGIN_RATE_PER_IP": "0",
+        "LOGIN_RATE_PER_USER": "0",
+        "SEARCH_RATE_PER_IP": "0",
+        "SEARCH_RATE_PER_USER": "0",
+    })
+    return directory
+
+
+# ==============================================================================
+# Szenarien
+# ==============================================================================
+class Recorder:
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+        self.failures: dict[str, int] = {}
+
+    async def request(self, client, route: str, method: str, url: str, expected=(200,), **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.samples.setdefault(route, []).append(time.perf_counter() - start)
+        if response.status_code not in expected:
+            self.failures[route] = self.failures.get(route, 0) + 1
+        return response
+
+
+async def login(client, recorder: Recorder, username: str) -> dict:
+    response = await recorder.request(
+        client, "POST /api/login", "POST", "/api/login", data={"username": username, "password": PASSWORD}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def technician(client, recorder: Recorder, rng: random.Random, username: str, errors: list[str], rounds: int):
+    headers = await login(client, recorder, username)
+    for _ in range(rounds):
+        # Suche während der Eingabe: Anfang eines vorhandenen Fehlertextes tippen
+        target = rng.choice(errors)
+        typed = target.lower()[: rng.randint(6, 18)]
+        for n in range(2, len(typed) + 1):
+            await recorder.request(client, "GET /api/search_errors", "GET", "/api/search_errors",
+                                   params={"query": typed[:n]}, headers=headers)
+        parts = await recorder.request(client, "POST /api/parts", "POST", "/api/parts",
+                                       json={"error": target}, headers=headers)
+        for part in parts.json()["parts"]:
+            await recorder.request(client, "POST /api/schematic", "POST", "/api/schematic",
+                                   json={"part": part}, headers=headers)
+
+
+async def administrator(client, recorder: Recorder, rng: random.Random, rounds: int, user_count: int):
+    headers = await login(client, recorder, "admin")
+    for n in range(rounds):
+        await recorder.request(client, "POST /api/admin/users", "POST", "/api/admin/users",
+                               expected=(201,), json={"username": f"neu{n}-{rng.random():.6f}", "password": PASSWORD, "role": "user"},
+                               headers=headers)
+        target = f"techniker{rng.randrange(user_count):06d}" if user_count else "admin"
+        await recorder.request(client, "PUT /api/admin/users/{username}", "PUT", f"/api/admin/users/{target}",
+                               json={"new_role": rng.choice(["user", "admin"])}, headers=headers)
+        await recorder.request(client, "GET /api/admin/users", "GET", "/api/admin/users", headers=headers)
+
+
+# ==============================================================================
+# Auswertung
+# ==============================================================================
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    summary = {}
+    for route, samples in sorted(recorder.samples.items()):
+        samples.sort()
+        summary[route] = {
+            "count": len(samples),
+            "rps": len(samples) / elapsed,
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+            "failures": recorder.failures.get(route, 0),
+        }
+    return summary
+
+
+def print_summary(summary: dict, elapsed: float):
+    total = sum(r["count"] for r in summary.values())
+    print(f"{total} Anfragen in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+    print(f"{'Route':<34} {'Anzahl':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Fehler':>6}")
+    for route, r in summary.items():
+        print(f"{route:<34} {r['count']:7d} {r['rps']:8.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} {r['failures']:6d}")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Routen, deren p95 oder Durchsatz sich gegenüber dem Baseline-Stand verschlechtert hat."""
+    regressions = []
+    for route, expected in baseline.items():
+        actual = summary.get(route)
+        if actual is None:
+            continue
+        if actual["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {actual['p95_ms']:.2f} ms > {expected['p95_ms']:.2f} ms (+{tolerance:.0%})")
+        if actual["rps"] < expected["rps"] * (1 - tolerance):
+            regressions.append(f"{route}: {actual['rps']:.1f} req/s < {expected['rps']:.1f} req/s (-{tolerance:.0%})")
+    for route, actual in summary.items():
+        if actual["failures"]:
+            regressions.append(f"{route}: {actual['failures']} unerwartete Statuscodes")
+    return regressions
+
+
+async def run(args):
+    import httpx
+    import main as app_module
+
+    errors = list(app_module.catalog_store.current.error_data)
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        tasks = [
+            technician(client, recorder, random.Random(rng.random()), f"techniker{i % max(args.users, 1):06d}" if args.users else "admin",
+                       errors, args.rounds)
+            for i in range(args.concurrency)
+        ]
+        tasks.append(administrator(client, recorder, random.Random(rng.random()), args.admin_rounds, args.users))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return summarize(recorder, elapsed), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--errors", type=int, default=20_000, help="Einträge im synthetischen Katalog")
+    parser.add_argument("--users", type=int, default=5_000, help="Anzahl Benutzer")
+    parser.add_argument("--store", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--concurrency", type=int, default=20, help="Gleichzeitige Techniker")
+    parser.add_argument("--rounds", type=int, default=10, help="Suchvorgänge pro Techniker")
+    parser.add_argument("--admin-rounds", type=int, default=20)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="JSON-Datei mit Vergleichswerten")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Erlaubte Verschlechterung (0.5 = 50%%)")
+    parser.add_argument("--write-baseline", help="Ergebnis als neuen Vergleichsstand speichern")
+    args = parser.parse_args()
+
+    prepare_environment(args)
+    summary, elapsed = asyncio.run(run(args))
+    print_summary(summary, elapsed)
+
+    # Nur Läufe mit denselben Parametern sind vergleichbar
+    parameters = {name: getattr(args, name) for name in BASELINE_PARAMETERS}
+
+    if args.write_baseline:
+        with open(args.write_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "parameters": parameters,
+                "routes": {route: {"p95_ms": round(r["p95_ms"], 3), "rps": round(r["rps"], 1)} for route, r in summary.items()},
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Baseline gespeichert: {args.write_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["parameters"] != parameters:
+            print(f"\n{args.baseline} wurde mit anderen Parametern erstellt: {baseline['parameters']}")
+            sys.exit(2)
+        regressions = compare(summary, baseline["routes"], args.tolerance)
+        if regressions:
+            print("\nRegressionen gegenüber", args.baseline)
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"\nKeine Regression gegenüber {args.baseline} (Toleranz {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
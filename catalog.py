@@ -0,0 +1,285 @@
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from functools import cached_property
+import os
+import random
+import threading
+import time
+import zlib
+
+import metrics
+from search import SearchIndex
+from static_assets import DYNAMIC_COMPRESSION, EncodedBody
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# Fehlerkatalog (Datei-Format)
+# ==============================================================================
+# Der Katalog liegt als kompakte JSON-Datei vor (siehe data/error_catalog.json):
+#
+#   {"format": 1, "version": "2024.1",
+#    "komponenten": ["Sensor", ...],
+#    "errors": [["<Fehler>", "<Lösung>"], ["<Fehler>", "<Lösung>", ["<Teil>", ...]], ...]}
+#
+# Teile ohne explizite Angabe werden deterministisch aus Fehlertext und Position
+# abgeleitet, sodass alle Worker und Neustarts dieselben Teile und Schaltpläne liefern.
+CATALOG_FORMAT = 1
+
+
+class CatalogError(Exception):
+    """Die Katalogdatei fehlt oder ist ungültig."""
+
+
+def assign_parts(position: int, error: str, komponenten: list[str]) -> list[str]:
+    """Leitet 1-3 Teile für einen Fehler ab; gleiche Eingaben liefern immer gleiche Teile."""
+    rng = random.Random(zlib.crc32(f"{position}:{error}".encode("utf-8")))
+    anzahl_teile = rng.randint(1, 3)
+    return [f"{rng.choice(komponenten)}-{position + 1}.{j + 1}" for j in range(anzahl_teile)]
+
+
+def schematic_for_part(part_name: str) -> str:
+    return f"plan_{part_name.lower().replace(' ', '_')}.pdf"
+
+
+def build_catalog_data(raw: dict) -> tuple[dict, dict]:
+    """Erzeugt error_data und teile_zu_schaltplan aus dem Dateiinhalt."""
+    if raw.get("format") != CATALOG_FORMAT:
+        raise CatalogError(f"Unsupported catalog format: {raw.get('format')!r}")
+    komponenten = raw.get("komponenten") or []
+    error_data = {}
+    teile_zu_schaltplan = {}
+
+    # Hilfs-Dictionary, um Duplikate zu zählen und Fehler eindeutig zu machen
+    error_counts = {}
+
+    for position, row in enumerate(raw.get("errors", [])):
+        error, remedy = row[0], row[1]
+
+        # Prüfe auf Duplikate und mache den Fehlertext eindeutig
+        if error in error_counts:
+            error_counts[error] += 1
+            unique_error = f"{error} ({error_counts[error]})"
+        else:
+            error_counts[error] = 1
+            unique_error = error
+
+        if len(row) > 2:
+            part_names = list(row[2])
+        elif komponenten:
+            part_names = assign_parts(position, error, komponenten)
+        else:
+            part_names = []
+
+        error_data[unique_error] = {"remedy": remedy, "parts": part_names}
+        for part_name in part_names:
+            teile_zu_schaltplan[part_name] = schematic_for_part(part_name)
+
+    return error_data, teile_zu_schaltplan
+
+
+class Catalog:
+    """Unveränderlicher Stand des Katalogs inklusive Suchindex."""
+
+    def __init__(self, version: str, error_data: dict, teile_zu_schaltplan: dict, stamp=None):
+        self.version = version
+        self.error_data = error_data
+        self.teile_zu_schaltplan = teile_zu_schaltplan
+        self.stamp = stamp
+        self.search_index = SearchIndex(error_data.keys())
+        self._delta_bodies: dict[str, EncodedBody] = {}
+
+    @cached_property
+    def all_errors_body(self) -> EncodedBody:
+        """Sortierte Fehlerliste als fertige, vorab komprimierte JSON-Antwort (einmal pro Version)."""
+        content = json.dumps(sorted(self.error_data), ensure_ascii=False, separators=(",", ":"))
+        return EncodedBody(content.encode("utf-8"), "application/json", DYNAMIC_COMPRESSION)
+
+    def warm_up(self):
+        """
+        Erzeugt und komprimiert die großen Antworten vorab. Aufgerufen, bevor der
+        Katalog aktuell wird und immer außerhalb des Event-Loops (Reload-Thread,
+        Thread-Pool der Abhängigkeit get_catalog oder warm_up im gunicorn-Master).
+        """
+        self.all_errors_body.warm_up()
+        self.snapshot_body.warm_up()
+
+    @cached_property
+    def content_version(self) -> str:
+        """
+        Kennung des Inhalts (Hash über Fehler, Lösungen, Teile und Schaltpläne).
+        Gleich in allen Workern und nach Neustarts, solange sich nichts ändert.
+        """
+        content = json.dumps([self._snapshot_rows(), self.teile_zu_schaltplan], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    def _snapshot_rows(self) -> list:
+        return [[error, entry["remedy"], entry["parts"]] for error, entry in self.error_data.items()]
+
+    @cached_property
+    def snapshot_body(self) -> EncodedBody:
+        """
+        Der ganze Katalog als kompakte JSON-Antwort für die Offline-Nutzung im Browser:
+        {"version", "catalog_version", "errors": [[Fehler, Lösung, [Teile]], ...], "parts": {Teil: Schaltplan}}
+        """
+        content = json.dumps({
+            "version": self.content_version,
+            "catalog_version": self.version,
+            "errors": self._snapshot_rows(),
+            "parts": self.teile_zu_schaltplan,
+        }, ensure_ascii=False, separators=(",", ":"))
+        return EncodedBody(content.encode("utf-8"), "application/json", DYNAMIC_COMPRESSION)
+
+    def delta_body(self, since: str, previous_error_data: dict, previous_parts: dict) -> EncodedBody:
+        """
+        Änderungen gegenüber einem früheren Stand im Format des Snapshots, ergänzt um
+        "since", "removed_errors" und "removed_parts". Pro Ausgangsstand nur einmal berechnet.
+        """
+        body = self._delta_bodies.get(since)
+        if body is None:
+            content = json.dumps({
+                "version": self.content_version,
+                "since": since,
+                "catalog_version": self.version,
+                "errors": [
+                    [error, entry["remedy"], entry["parts"]]
+                    for error, entry in self.error_data.items() if previous_error_data.get(error) != entry
+                ],
+                "removed_errors": [error for error in previous_error_data if error not in self.error_data],
+                "parts": {
+                    part: schematic
+                    for part, schematic in self.teile_zu_schaltplan.items() if previous_parts.get(part) != schematic
+                },
+                "removed_parts": [part for part in previous_parts if part not in self.teile_zu_schaltplan],
+            }, ensure_ascii=False, separators=(",", ":"))
+            body = self._delta_bodies[since] = EncodedBody(content.encode("utf-8"), "application/json", DYNAMIC_COMPRESSION)
+        return body
+
+    def detail(self, error: str) -> dict:
+        """Lösung, Teile und zugehörige Schaltpläne eines Fehlers in einem Ergebnis."""
+        entry = self.error_data.get(error)
+        if entry is None:
+            return {"error": error, "remedy": "Keine Daten gefunden.", "parts": []}
+        return {
+            "error": error,
+            "remedy": entry["remedy"],
+            "parts": [{"part": part, "schematic": self.teile_zu_schaltplan.get(part)} for part in entry["parts"]],
+        }
+
+
+def _file_stamp(path: str):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def load_catalog(path: str) -> Catalog:
+    """Lädt und baut den Katalog aus einer Datei."""
+    try:
+        stamp = _file_stamp(path)
+        with open(path, "rb") as f:
+            raw = json.loads(f.read())
+    except (OSError, ValueError) as exc:
+        raise CatalogError(f"Catalog file {path} could not be read: {exc}") from exc
+    try:
+        error_data, teile_zu_schaltplan = build_catalog_data(raw)
+    except (AttributeError, IndexError, KeyError, TypeError) as exc:
+        raise CatalogError(f"Catalog file {path} is malformed: {exc!r}") from exc
+    return Catalog(str(raw.get("version", "")), error_data, teile_zu_schaltplan, stamp=stamp)
+
+
+# ==============================================================================
+# Katalog-Verwaltung mit Hot Reload
+# ==============================================================================
+class CatalogStore:
+    """
+    Hält den aktuellen Katalog. Ein neuer Stand wird vollständig aufgebaut und
+    dann mit einer einzigen Zuweisung ausgetauscht; laufende Anfragen arbeiten
+    mit dem Stand weiter, den sie zu Beginn gelesen haben.
+    """
+
+    def __init__(self, path: str, check_interval: float = 0, history_size: int = 3):
+        self.path = path
+        self.check_interval = check_interval
+        self.history_size = history_size
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._failed_stamp = None
+        # Wird erst beim ersten Zugriff geladen, nicht schon beim Import
+        self._current: Catalog | None = None
+        # Daten früherer Stände (content_version -> (error_data, teile_zu_schaltplan)),
+        # aus denen Deltas für Clients mit älterem Stand berechnet werden
+        self._history: OrderedDict = OrderedDict()
+
+    @property
+    def current(self) -> Catalog:
+        catalog = self._current
+        if catalog is None:
+            with self._reload_lock:
+                if self._current is None:
+                    catalog = load_catalog(self.path)
+                    catalog.warm_up()
+                    self._set_current(catalog)
+                catalog = self._current
+        return catalog
+
+    def _set_current(self, catalog: Catalog):
+        previous = self._current
+        if previous is not None and previous.content_version != catalog.content_version and self.history_size > 0:
+            self._history[previous.content_version] = (previous.error_data, previous.teile_zu_schaltplan)
+            self._history.pop(catalog.content_version, None)
+            while len(self._history) > self.history_size:
+                self._history.popitem(last=False)
+        self._current = catalog
+        metrics.set_catalog(catalog.version, len(catalog.error_data))
+
+    def reload(self) -> Catalog:
+        """Lädt die Datei neu und tauscht den Katalog atomar aus."""
+        with self._reload_lock:
+            catalog = load_catalog(self.path)
+            # Antworten vor dem Austausch erzeugen, damit Clients danach nicht warten;
+            # Browser holen nach einem Reload vor allem Deltas vom vorherigen Stand
+            catalog.warm_up()
+            previous = self._current
+            if previous is not None and self.history_size > 0:
+                catalog.delta_body(previous.content_version, previous.error_data, previous.teile_zu_schaltplan).warm_up()
+            self._set_current(catalog)
+        logger.info("Catalog %s loaded (%d errors)", catalog.version, len(catalog.error_data))
+        return catalog
+
+    def delta_body(self, catalog: Catalog, since: str) -> EncodedBody | None:
+        """Änderungen von since bis catalog; None, wenn since hier nicht (mehr) bekannt ist."""
+        if since == catalog.content_version:
+            return catalog.delta_body(since, catalog.error_data, catalog.teile_zu_schaltplan)
+        previous = self._history.get(since)
+        if previous is None:
+            return None
+        return catalog.delta_body(since, *previous)
+
+    def check_for_update(self):
+        """
+        Prüft höchstens alle check_interval Sekunden die Änderungszeit der Datei
+        und startet bei Bedarf einen Reload im Hintergrund.
+        """
+        if self.check_interval <= 0:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            stamp = _file_stamp(self.path)
+        except OSError:
+            return
+        if stamp in (self.current.stamp, self._failed_stamp) or self._reload_lock.locked():
+            return
+        threading.Thread(target=self._background_reload, args=(stamp,), name="catalog-reload", daemon=True).start()
+
+    def _background_reload(self, stamp):
+        try:
+            self.reload()
+        except CatalogError:
+            # Fehlerhafte Dateien nicht bei jeder Prüfung erneut laden
+            self._failed_stamp = stamp
+            logger.exception("Catalog reload failed, keeping version %s", self.current.version)
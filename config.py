@@ -1,9 +1,62 @@
+import os
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     SECRET_KEY: str = "a_very_secret_key_that_should_be_changed"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Kostenfaktor für neue bcrypt-Hashes (bestehende Hashes behalten ihren Wert)
+    BCRYPT_ROUNDS: int = 12
+    # Threads für bcrypt; Hashing läuft nie im Event-Loop
+    PASSWORD_HASH_WORKERS: int = 4
+    # Threads für das Hashing bei Massenimporten (/api/admin/users/bulk), getrennt
+    # von Login und Einzeländerungen; begrenzt, wie viel CPU ein Import belegt
+    BULK_HASH_WORKERS: int = 1
+    # Gleichzeitig verarbeitete Logins und maximale Warteschlange, danach 429
+    LOGIN_MAX_CONCURRENCY: int = 4
+    LOGIN_MAX_QUEUE: int = 64
+    # Token-Buckets pro Worker: Anfragen pro Sekunde und angesparter Vorrat (Rate 0 = aus).
+    # Login je Client-IP und je Paar aus IP und angegebenem Benutzernamen (ein
+    # erfolgreicher Login setzt das Paar zurück; fremde Adressen können ein Konto so
+    # nicht sperren), Suche (ein Aufruf pro Tastendruck) je angemeldetem Benutzer
+    # und je IP (mehrere Tablets hinter NAT)
+    LOGIN_RATE_PER_IP: float = 1.0
+    LOGIN_BURST_PER_IP: int = 10
+    LOGIN_RATE_PER_USER: float = 0.2
+    LOGIN_BURST_PER_USER: int = 5
+    SEARCH_RATE_PER_USER: float = 10.0
+    SEARCH_BURST_PER_USER: int = 40
+    SEARCH_RATE_PER_IP: float = 50.0
+    SEARCH_BURST_PER_IP: int = 200
+    # Höchstzahl gemerkter Clients je Limiter (älteste werden verdrängt)
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Gleichzeitig bearbeitete Anfragen pro Worker, darüber 503 mit Retry-After (0 = aus)
+    MAX_IN_FLIGHT_REQUESTS: int = 256
+    # Maximale Anzahl zwischengespeicherter, bereits verifizierter Tokens (0 = aus)
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    # Speicher für Benutzer: "json" (users.json, für kleine Installationen) oder "sqlite"
+    USER_STORE: str = "json"
+    # Pfad der users.json; leer = /data/users.json bzw. neben dem Code
+    USER_JSON_FILE: str = ""
+    # Verzögerung in Sekunden, in der Änderungen an users.json zu einem Schreibvorgang
+    # zusammengefasst werden (0 = sofort und synchron schreiben)
+    USER_DB_FLUSH_DELAY: float = 0.5
+    # Pfad der SQLite-Datenbank; leer = users.db im Datenverzeichnis (/data bzw. neben dem Code)
+    USER_SQLITE_FILE: str = ""
+    # Sekunden zwischen zwei Prüfungen, ob ein anderer Worker Benutzer geändert hat
+    # (obere Grenze, bis Änderungen überall gelten; 0 = nicht prüfen)
+    USER_SYNC_INTERVAL: float = 1.0
+    CATALOG_FILE: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "error_catalog.json")
+    # Sekunden zwischen zwei Prüfungen der Katalogdatei auf Änderungen (0 = nur manueller Reload)
+    CATALOG_RELOAD_INTERVAL: float = 5.0
+    # Frühere Katalogstände pro Worker, zu denen Browser Deltas abrufen können;
+    # ältere Stände laden den ganzen Snapshot neu
+    CATALOG_HISTORY_SIZE: int = 3
+    # Gemeinsames Verzeichnis, über das die Worker ihre Metriken für /metrics austauschen;
+    # leer = keine Dateien, /metrics zeigt nur den eigenen Prozess (gunicorn.conf.py legt
+    # pro Master eines an; für uvicorn --workers selbst setzen)
+    METRICS_DIR: str = ""
 
     class Config:
         env_file = ".env"
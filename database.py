@@ -1,7 +1,11 @@
 from pydantic import BaseModel
-from passlib.context import CryptContext
-import json
+from functools import cache
 import os
+import threading
+
+from config import settings
+from metrics import timed
+from user_store import JsonUserStore, SqliteUserStore, UserStore
 
 # ==============================================================================
 # Pydantic Modelle für Benutzer
@@ -19,97 +23,168 @@ class UserInDB(User):
 # ==============================================================================
 # Passwort-Kontext und Verifizierung
 # ==============================================================================
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@cache
+def _pwd_context():
+    # passlib und das bcrypt-Backend erst beim ersten Gebrauch laden (kürzerer Start)
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 def verify_password(plain_password, hashed_password):
     """Überprüft ein Klartext-Passwort gegen einen Hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with timed("verify_password"):
+        return _pwd_context().verify(plain_password, hashed_password)
+
+def hash_password(plain_password):
+    """Erzeugt den bcrypt-Hash eines Klartext-Passworts."""
+    return _pwd_context().hash(plain_password)
 
 # ==============================================================================
-# Persistente Benutzerdatenbank (JSON-Datei)
+# Persistente Benutzerdatenbank
 # ==============================================================================
 # Render stellt einen persistenten Speicher unter /data bereit.
 # Lokal verwenden wir weiterhin den alten Pfad als Fallback.
 RENDER_DATA_DIR = "/data"
-DB_FILE = os.path.join(RENDER_DATA_DIR, "users.json") if os.path.exists(RENDER_DATA_DIR) else os.path.join(os.path.dirname(__file__), "users.json")
-_users_db = {} # Wird jetzt aus der Datei geladen
+_DATA_DIR = RENDER_DATA_DIR if os.path.exists(RENDER_DATA_DIR) else os.path.dirname(os.path.abspath(__file__))
+DB_FILE = settings.USER_JSON_FILE or os.path.join(_DATA_DIR, "users.json")
+SQLITE_FILE = settings.USER_SQLITE_FILE or os.path.join(_DATA_DIR, "users.db")
+_store: UserStore | None = None # Wird beim ersten Zugriff geöffnet (siehe _get_store)
+_store_lock = threading.Lock()
 
-def _save_db():
-    """Speichert die In-Memory-DB in die JSON-Datei."""
-    with open(DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(_users_db, f, indent=4)
+# Rückrufe, die bei Änderungen an einem Benutzer mit dessen Namen aufgerufen
+# werden (z.B. um zwischengespeicherte Anmeldungen zu verwerfen)
+_change_listeners = []
 
-def _load_db():
-    """Lädt die DB aus der JSON-Datei oder initialisiert sie, wenn sie nicht existiert."""
-    global _users_db
-    if os.path.exists(DB_FILE):
-        with open(DB_FILE, "r", encoding="utf-8") as f:
-            _users_db = json.load(f)
+def add_change_listener(callback):
+    """
+    Registriert einen Rückruf callback(username) für Benutzeränderungen.
+    username ist None, wenn ein anderer Worker geändert hat und die betroffenen
+    Benutzer nicht bekannt sind.
+    """
+    _change_listeners.append(callback)
+
+def _notify_change(username: str | None):
+    for callback in _change_listeners:
+        callback(username)
+
+# Vorab berechnete bcrypt-Hashes (12 Runden) der Standard-Passwörter "Admin123"
+# und "user123"; der erste Start muss so nicht selbst hashen
+_DEFAULT_ADMIN_HASH = "$2b$12$mUBQRJDRZEu6SVb3m1v0Au.dwsuzwYvH8nHGxNoTodOWbIVWvKjNW"
+_DEFAULT_USER_HASH = "$2b$12$LBsvE/AbPPxM03kC5dKSAeDLyQFzPGhnwXC59.XSU3czuZ0BQCqTu"
+
+def _default_users() -> list[dict]:
+    return [
+        {
+            "username": "admin", "full_name": "Haupt-Administrator", "email": "admin@example.com",
+            "hashed_password": _DEFAULT_ADMIN_HASH, "role": "admin", "disabled": False
+        },
+        {
+            "username": "user", "full_name": "Standard-Benutzer", "email": "user@example.com",
+            "hashed_password": _DEFAULT_USER_HASH, "role": "user", "disabled": False
+        },
+    ]
+
+def _open_store() -> UserStore:
+    """Öffnet das konfigurierte Backend (USER_STORE) und legt bei Bedarf Standard-Benutzer an."""
+    if settings.USER_STORE == "sqlite":
+        store = SqliteUserStore(SQLITE_FILE, check_interval=settings.USER_SYNC_INTERVAL)
+        if store.count() == 0 and os.path.exists(DB_FILE):
+            # Erster Start mit SQLite: bestehende users.json übernehmen
+            store.add_many(JsonUserStore(DB_FILE).all())
+    elif settings.USER_STORE == "json":
+        store = JsonUserStore(DB_FILE, flush_delay=settings.USER_DB_FLUSH_DELAY, check_interval=settings.USER_SYNC_INTERVAL)
     else:
-        # Initialisiere mit Standard-Benutzern, wenn die Datei nicht existiert
-        _users_db = {
-            "admin": {
-                "username": "admin", "full_name": "Haupt-Administrator", "email": "admin@example.com",
-                "hashed_password": pwd_context.hash("Admin123"), "role": "admin", "disabled": False
-            },
-            "user": {
-                "username": "user", "full_name": "Standard-Benutzer", "email": "user@example.com",
-                "hashed_password": pwd_context.hash("user123"), "role": "user", "disabled": False
-            }
-        }
-        _save_db()
+        raise ValueError(f"Unknown USER_STORE {settings.USER_STORE!r} (expected 'json' or 'sqlite')")
+    if store.count() == 0:
+        # Initialisiere mit Standard-Benutzern, wenn noch niemand existiert
+        store.add_many(_default_users())
+        store.flush()
+    return store
+
+def _load_db():
+    """Öffnet die Benutzerdatenbank."""
+    global _store
+    _store = _open_store()
+
+def _get_store() -> UserStore:
+    """Die Benutzerdatenbank; beim ersten Aufruf wird sie geöffnet."""
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _load_db()
+    return _store
+
+def warm_up():
+    """
+    Öffnet die Benutzerdatenbank und lädt das bcrypt-Backend im Voraus, z.B. im
+    gunicorn-Master vor dem fork (--preload), damit Worker sofort bereit sind.
+    """
+    # Danach schreiben und Verbindungen schließen: SQLite-Verbindungen dürfen nicht
+    # über fork vererbt werden, die Worker öffnen beim ersten Zugriff eigene
+    _get_store().close()
+    _pwd_context().handler().get_backend()
+
+def sync_user_changes():
+    """
+    Übernimmt Änderungen anderer Worker. Die eigentliche Prüfung findet höchstens
+    alle USER_SYNC_INTERVAL Sekunden statt; dazwischen kostet der Aufruf fast nichts.
+    """
+    if _get_store().check_for_changes():
+        _notify_change(None)
 
 def get_user(username: str) -> UserInDB | None:
-    """Sucht einen Benutzer in der In-Memory-Datenbank."""
-    for db_username, user_data in _users_db.items():
-        if db_username.lower() == username.lower():
-            return UserInDB(**user_data)
-    return None
+    """Sucht einen Benutzer in der Datenbank."""
+    sync_user_changes()
+    user_data = _get_store().get(username)
+    if user_data is None:
+        return None
+    return UserInDB(**user_data)
 
 def add_user(user: UserInDB):
-    """Fügt einen neuen Benutzer hinzu und speichert in die Datei."""
-    for existing_user in _users_db:
-        if existing_user.lower() == user.username.lower():
-            return False # Benutzer existiert bereits
-    _users_db[user.username] = user.dict()
-    _save_db()
-    return True
+    """Fügt einen neuen Benutzer hinzu und speichert ihn."""
+    sync_user_changes()
+    return _get_store().add(user.dict()) # False, wenn der Benutzer bereits existiert
+
+def add_users(users: list[UserInDB]) -> list[str]:
+    """Fügt mehrere Benutzer mit einem einzigen Schreibvorgang hinzu; liefert die angelegten Namen."""
+    sync_user_changes()
+    return _get_store().add_many([user.dict() for user in users])
 
-def get_all_users() -> list[User]:
-    """Gibt eine Liste aller Benutzer zurück (ohne Passwörter)."""
-    return [User(**user_data) for user_data in _users_db.values()]
+def get_users_page(after: str | None, limit: int) -> list[User]:
+    """Bis zu limit Benutzer (ohne Passwörter), alphabetisch nach dem Benutzernamen after."""
+    sync_user_changes()
+    return [User(**user_data) for user_data in _get_store().page(after, limit)]
+
+def iter_user_records():
+    """Alle Benutzer inklusive Passwort-Hashes aus einem festen Zeitpunkt (für Exporte und Backups)."""
+    sync_user_changes()
+    return _get_store().iter_snapshot()
 
 def update_user_data(username: str, update_data: dict) -> bool:
-    """Aktualisiert die Daten eines Benutzers und speichert in die Datei."""
-    user_to_update = None
-    for db_username in _users_db:
-        if db_username.lower() == username.lower():
-            user_to_update = db_username
-            break
-    
+    """Aktualisiert die Daten eines Benutzers und speichert die Änderung."""
+    changes = {}
+    if "new_hashed_password" in update_data:
+        # Bereits außerhalb gehasht (siehe hashing.hash_password_async)
+        changes["hashed_password"] = update_data["new_hashed_password"]
+    elif "new_password" in update_data and update_data["new_password"]:
+        changes["hashed_password"] = hash_password(update_data["new_password"])
+    if "new_role" in update_data:
+        changes["role"] = update_data["new_role"]
+    if "disabled" in update_data:
+        changes["disabled"] = update_data["disabled"]
+
+    sync_user_changes()
+    user_to_update = _get_store().update(username, changes)
     if not user_to_update:
         return False
-
-    if "new_password" in update_data and update_data["new_password"]:
-        _users_db[user_to_update]["hashed_password"] = pwd_context.hash(update_data["new_password"])
-    if "new_role" in update_data:
-        _users_db[user_to_update]["role"] = update_data["new_role"]
-    
-    _save_db()
+    _notify_change(user_to_update)
     return True
 
 def delete_user(username: str) -> bool:
-    """Löscht einen Benutzer und speichert die Änderung in die Datei."""
-    user_to_delete = None
-    for db_username in _users_db:
-        if db_username.lower() == username.lower():
-            user_to_delete = db_username
-            break
-
-    if user_to_delete and _users_db.pop(user_to_delete, None):
-        _save_db()
-        return True
-    return False
-
-# Lade die Datenbank beim Start des Moduls
-_load_db()
\ No newline at end of file
+    """Löscht einen Benutzer und speichert die Änderung."""
+    sync_user_changes()
+    user_to_delete = _get_store().delete(username)
+    if not user_to_delete:
+        return False
+    _notify_change(user_to_delete)
+    return True
+
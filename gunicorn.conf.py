@@ -0,0 +1,38 @@
+import os
+import shutil
+import tempfile
+
+# ==============================================================================
+# gunicorn-Konfiguration
+# ==============================================================================
+# Start: gunicorn main:app -c gunicorn.conf.py
+#
+# Die Anwendung wird einmal im Master geladen und aufgewärmt (preload_app,
+# when_ready); die Worker entstehen per fork und teilen sich Katalog, Suchindex
+# und komprimierte Dateien per copy-on-write. Threads, Thread-Pools und
+# SQLite-Verbindungen legt jeder Worker beim ersten Gebrauch selbst an.
+bind = f"0.0.0.0:{os.environ.get('PORT', '8003')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Proxys, deren X-Forwarded-For übernommen wird (Client-IP für die Rate-Limits);
+# "*" nur, wenn die Worker ausschließlich hinter dem Proxy erreichbar sind
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Metrik-Verzeichnis nur für diesen Master und seine Worker (siehe metrics.py);
+# die Worker erben die Umgebungsvariable, bevor config.settings gelesen wird
+_own_metrics_dir = not os.environ.get("METRICS_DIR")
+if _own_metrics_dir:
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="wartungshilfe-metrics-")
+
+
+def when_ready(server):
+    # Läuft im Master nach dem Laden der Anwendung und vor dem Start der Worker
+    import main
+    main.warm_up()
+    server.log.info("Application warmed up")
+
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
@@ -0,0 +1,83 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from config import settings
+from database import hash_password, verify_password
+
+# ==============================================================================
+# Passwort-Hashing außerhalb des Event-Loops
+# ==============================================================================
+# bcrypt gibt während der Berechnung den GIL frei, daher genügt ein Thread-Pool.
+# Die Pools werden pro Prozess beim ersten Gebrauch angelegt (Threads überleben
+# keinen fork, z.B. bei gunicorn --preload). Massenimporte haben einen eigenen,
+# kleineren Pool, damit sie Logins nicht verdrängen.
+_executors: dict[str, tuple[int, ThreadPoolExecutor]] = {}
+
+
+def _executor_for(name: str, max_workers: int) -> ThreadPoolExecutor:
+    entry = _executors.get(name)
+    if entry is None or entry[0] != os.getpid():
+        entry = _executors[name] = (os.getpid(), ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name))
+    return entry[1]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    return _executor_for("password-hash", settings.PASSWORD_HASH_WORKERS)
+
+
+def _get_bulk_executor() -> ThreadPoolExecutor:
+    return _executor_for("password-hash-bulk", settings.BULK_HASH_WORKERS)
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(plain_password) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), hash_password, plain_password)
+
+
+async def hash_passwords_bulk_async(plain_passwords: list[str]) -> list[str]:
+    """Hasht viele Passwörter im eigenen Pool für Massenimporte (BULK_HASH_WORKERS)."""
+    loop = asyncio.get_running_loop()
+    executor = _get_bulk_executor()
+    return await asyncio.gather(*(loop.run_in_executor(executor, hash_password, password) for password in plain_passwords))
+
+
+# ==============================================================================
+# Zugangskontrolle für teure Anfragen (Login)
+# ==============================================================================
+class AdmissionRejected(Exception):
+    """Warteschlange voll; die Anfrage soll später wiederholt werden."""
+
+
+class AdmissionLimiter:
+    """
+    Lässt höchstens max_concurrency Anfragen gleichzeitig arbeiten und bis zu
+    max_queue weitere warten. Darüber hinaus wird sofort abgelehnt, statt die
+    Wartezeit für alle zu verlängern.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_pending = max_concurrency + max_queue
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._pending >= self._max_pending:
+            raise AdmissionRejected()
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                yield
+        finally:
+            self._pending -= 1
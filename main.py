@@ -1,25 +1,67 @@
+import asyncio
+import base64
 import fastapi
 import uvicorn
 import os
 import json
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from fastapi import Depends, HTTPException, status
+from typing import Annotated
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from fastapi import Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 
-import random
 # Lokale Importe
 from config import settings 
-from database import User, UserInDB, get_user, add_user, verify_password, pwd_context, get_all_users, update_user_data, delete_user
+from database import User, UserInDB, get_user, add_user, add_users, get_users_page, iter_user_records, update_user_data, delete_user, add_change_listener, sync_user_changes, warm_up as warm_up_users
+from hashing import AdmissionLimiter, AdmissionRejected, hash_password_async, hash_passwords_bulk_async, verify_password_async
+from auth_cache import PrincipalCache
+from catalog import Catalog, CatalogError, CatalogStore
+from static_assets import StaticAssets
+import metrics
+from throttling import LoadShedder, RateLimiter, retry_after_header
 
 # ==============================================================================
 # Security Konfiguration
 # ==============================================================================
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
+# Bereits geprüfte Tokens; Änderungen an Benutzern verwerfen deren Einträge sofort
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE)
+
+def _on_user_change(username: str | None):
+    # None: ein anderer Worker hat geändert, betroffene Benutzer sind unbekannt
+    if username is None:
+        principal_cache.clear()
+    else:
+        principal_cache.invalidate_user(username)
+
+add_change_listener(_on_user_change)
+
+# Begrenzt gleichzeitige bcrypt-Prüfungen beim Login; volle Warteschlange -> 429
+login_limiter = AdmissionLimiter(settings.LOGIN_MAX_CONCURRENCY, settings.LOGIN_MAX_QUEUE)
+
+# Rate-Limits pro Client für die teuren Pfade; überschritten -> 429 mit Retry-After
+login_ip_limiter = RateLimiter("login_ip", settings.LOGIN_RATE_PER_IP, settings.LOGIN_BURST_PER_IP, settings.RATE_LIMIT_MAX_KEYS)
+login_user_limiter = RateLimiter("login_user", settings.LOGIN_RATE_PER_USER, settings.LOGIN_BURST_PER_USER, settings.RATE_LIMIT_MAX_KEYS)
+search_ip_limiter = RateLimiter("search_ip", settings.SEARCH_RATE_PER_IP, settings.SEARCH_BURST_PER_IP, settings.RATE_LIMIT_MAX_KEYS)
+search_user_limiter = RateLimiter("search_user", settings.SEARCH_RATE_PER_USER, settings.SEARCH_BURST_PER_USER, settings.RATE_LIMIT_MAX_KEYS)
+
+def _client_ip(request: Request) -> str:
+    # Hinter einem Proxy liefert uvicorn/gunicorn hier die Adresse aus X-Forwarded-For
+    # (siehe forwarded_allow_ips in gunicorn.conf.py)
+    return request.client.host if request.client else "unknown"
+
+def _check_rate(*checks: tuple[RateLimiter, str]):
+    """Prüft die Limiter nacheinander; beim ersten überschrittenen -> 429."""
+    for limiter, key in checks:
+        retry_after = limiter.acquire(key)
+        if retry_after:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests, please slow down", headers=retry_after_header(retry_after))
+
 # ==============================================================================
 # Authentifizierungs-Funktionen
 # ==============================================================================
@@ -33,22 +75,35 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def _user_for_token(token: str) -> UserInDB | None:
+    """Benutzer zu einem Token (aus dem Cache oder per JWT-Prüfung); None, wenn ungültig."""
+    # Vor dem Cache prüfen, damit Änderungen anderer Worker auch hier ankommen
+    sync_user_changes()
+    cached_user = principal_cache.get(token)
+    if cached_user is not None:
+        return cached_user
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+        with metrics.timed("jwt_decode"):
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     except JWTError:
-        raise credentials_exception
+        return None
+    username: str = payload.get("sub")
+    if username is None:
+        return None
     user = get_user(username=username)
     if user is None:
-        raise credentials_exception
+        return None
+    principal_cache.put(token, user, payload.get("exp"))
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    user = _user_for_token(token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
@@ -56,6 +111,9 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def limit_search_rate(request: Request, current_user: User = Depends(get_current_active_user)):
+    _check_rate((search_ip_limiter, _client_ip(request)), (search_user_limiter, current_user.username.lower()))
+
 # Dependency für Admin-Rolle
 def is_admin(current_user: User = Depends(get_current_active_user)):
     if current_user.role != "admin":
@@ -65,133 +123,43 @@ def is_admin(current_user: User = Depends(get_current_active_user)):
 # ==============================================================================
 # Daten-Integration
 # ==============================================================================
-def load_data():
-    """
-    Lädt die Fehlerliste und generiert dynamisch Lösungsvorschläge,
-    Teile und Schaltpläne. Diese Logik ist aus der ursprünglichen
-    Schaltplan.py-Datei integriert.
-    """
-    error_data = {}
-    teile_zu_schaltplan = {}
-    
-    # Strukturierte Daten aus dem User-Input
-    real_error_data = [
-        {"error": "Not enough memory to generate the external reference list", "remedy": "Increase PLC memory or simplify program."},
-        {"error": "Cycle time is greater than the set watchdog time", "remedy": "Change task configuration"},
-        {"error": "Access violation by an IEC task (for example zero pointer)", "remedy": "Correct program"},
-        {"error": "Exception cannot be assigned to an IEC task", "remedy": "Correct program"},
-        {"error": "Cycle time of IEC task is greater than watchdog time", "remedy": "Change task configuration"},
-        {"error": "There is not enough memory available for configuration of PROFINET Controller", "remedy": "Reboot PLC, reduce PROFINET configuration and reload project"},
-        {"error": "Internal error occured during configuration of PROFINET Controller", "remedy": "Reboot PLC and reload project"},
-        {"error": "Internal error, no access to IO data", "remedy": "Restart CPU or call support"},
-        {"error": "Watchdog task could not be installed", "remedy": "Check Communication Module, Check CPU firmware version"},
-        {"error": "Installation of the Communication Module bus driver failed", "remedy": "Check Communication Module, Check CPU firmware version"},
-        {"error": "Initialization error, not enough memory", "remedy": "Check Communication Module, Check CPU firmware version"},
-        {"error": "Accessing test to the Communication Module failed", "remedy": "Check Communication Module, Check CPU FW version"},
-        {"error": "Watchdog test for the Communication Module failed", "remedy": "Check Communication Module"},
-        {"error": "Error in configuration data, PLC cannot read", "remedy": "Create new configuration"},
-        {"error": "Timeout when setting the warm start parameters of the Communication Module", "remedy": "Check Communication Module"},
-        {"error": "Installation of the Communication Module driver failed", "remedy": "Check Communication Module and FW version"},
-        {"error": "Error occurred when creating the I/O description list of the Communication Module", "remedy": "Check Communication Module and FW version"},
-        {"error": "Error configuration", "remedy": "Check configuration"},
-        {"error": "Error in firmware version of Communication Module (version not supported/too old)", "remedy": "Update firmware"},
-        {"error": "Maximum errors in series detected 50 telegrams in sequence are invalid or corrupted.", "remedy": "Restart PLC. If error still exists, replace PLC."},
-        {"error": "Installation of a protocol driver for the serial interface failed, not enough memory", "remedy": "Check CPU FW version"},
-        {"error": "Incorrect data format of the hardware driver of the I/O-Bus", "remedy": "Check CPU FW version"},
-        {"error": "FPU division by zero", "remedy": "Clear up program"},
-        {"error": "FPU overflow", "remedy": "Clear up program"},
-        {"error": "FPU underflow", "remedy": "Clear up program"},
-        {"error": "Forbidden FPU operation (e.g. 0/0)", "remedy": "Clear up program"},
-        {"error": "Error internal Ethernet", "remedy": "Replace module"},
-        {"error": "Program not started because of an existing error", "remedy": "Eliminate error and acknowledge"},
-        {"error": "User program contains an endless loop, a stop by hand is necessary", "remedy": "Correct user program"},
-        {"error": "No configuration available", "remedy": "Create new configuration, check configuration"},
-        {"error": "Writing of the boot project failed", "remedy": "Reload project"},
-        {"error": "Failed to delete boot project", "remedy": "Failed to delete boot project"}, # Remedy was missing, used error as placeholder
-        {"error": "Error firmware update of SD card, file could not be opened", "remedy": "Check SD card, e.g. removed without 'ejected'"},
-        {"error": "Error while reading/writing the configuration data from/to the SD card", "remedy": "Check SD card"},
-        {"error": "Timeout in the I/O Module", "remedy": "Replace module"},
-        {"error": "Overflow diagnosis buffer", "remedy": "Clear all errors"},
-        {"error": "Process voltage too high", "remedy": "Correct value"}, # Generic remedy
-        {"error": "Process voltage too low", "remedy": "Correct value"}, # Generic remedy
-        {"error": "Plausibility check failed (iParameter)", "remedy": "Check parameters"}, # Generic remedy
-        {"error": "Checksum error in the I/O Module", "remedy": "Check module"}, # Generic remedy
-        {"error": "PROFIsafe communication error", "remedy": "Check PROFIsafe configuration"}, # Generic remedy
-        {"error": "PROFIsafe watchdog timed out", "remedy": "Check PROFIsafe configuration"}, # Generic remedy
-        {"error": "Parameter value or configuration error", "remedy": "Check parameter value or configuration"},
-        {"error": "Internal data interchange disturbed", "remedy": "Restart PLC"}, # Generic remedy
-        {"error": "Different hardware and firmware versions in the module", "remedy": "Update firmware or check hardware"},
-        {"error": "Internal error in the device", "remedy": "Replace device"},
-        {"error": "Sensor voltage too low", "remedy": "Check sensor voltage supply"},
-        {"error": "Process voltage switched off (ON->OFF)", "remedy": "Check process voltage supply"},
-        {"error": "Wrong measurement; wrong temperature at the compensations channel", "remedy": "Check sensor and compensation channel"},
-        {"error": "AI531: Wrong measurement; potential difference is to high", "remedy": "Check wiring and potential difference"},
-        {"error": "Output overflow at analog output", "remedy": "Check output load and configuration"},
-        {"error": "Measurement underflow at the analog input", "remedy": "Check sensor and wiring"},
-        {"error": "Input/output value to high", "remedy": "Check input/output signal level"},
-        {"error": "Short-circuit at the analog input", "remedy": "Check wiring for short-circuits"},
-        {"error": "Measurement overflow or cut wire at the analog input", "remedy": "Check sensor and wiring for open circuits"},
-        {"error": "Short-circuit at the digital output", "remedy": "Check terminal and wiring for short-circuits."},
-        {"error": "PLC conflict", "remedy": "Resolve PLC conflict"}, # Generic remedy
-        {"error": "Outputs are different (synchronization error)", "remedy": "Check synchronization logic"},
-        # --- Ab hier die neuen Fehler aus dem zweiten Teil ---
-        {"error": "Timeout in the I/O Module", "remedy": "Replace I/O module"},
-        {"error": "Overflow diagnosis buffer", "remedy": "Restart"},
-        {"error": "Process voltage too high", "remedy": "Check process voltage"},
-        {"error": "Process voltage too low", "remedy": "Check process voltage"},
-        {"error": "Plausibility check failed (iParameter)", "remedy": "Check configuration"},
-        {"error": "Checksum error in the I/O Module", "remedy": "Non-safety I/O: Replace I/O Module. Safety-I/O: Check safety configuration and CRCs for iParameters and F-Parameters"},
-        {"error": "PROFIsafe communication error", "remedy": "Restart I/O Module. If this error persists, contact ABB technical support."},
-        {"error": "PROFIsafe watchdog timed out", "remedy": "Restart I/O Module. If this error persists, increase PROFIsafe watchdog time."},
-        {"error": "Parameter value or configuration", "remedy": "Check master"},
-        {"error": "F-Parameter configuration and address switch value do not match", "remedy": "Check I/O Module's F-Parameter configuration and module address switch value"},
-        {"error": "Internal data interchange disturbed", "remedy": "Replace I/O Module"},
-        {"error": "Different hardware and firmware versions in the module", "remedy": "Replace I/O Module"},
-        {"error": "Internal error in the device", "remedy": "Replace I/O Module"},
-        {"error": "Sensor voltage too low", "remedy": "Check sensor voltage"},
-        {"error": "Process voltage switched off (ON->OFF)", "remedy": "Process voltage ON"},
-        {"error": "Wrong measurement; wrong temperature at the compensations channel", "remedy": "Check temperature compensation channel"},
-        {"error": "AI531: Wrong measurement; potential difference is to high", "remedy": "AI531: Check potential difference"},
-        {"error": "CD522: PWM duty cycle out of duty area", "remedy": "CD522: Check min/max values"},
-        {"error": "Output overflow at analog output", "remedy": "Check output value"},
-        {"error": "Measurement underflow at the analog input", "remedy": "Check input value"},
-        {"error": "Input/output value to high", "remedy": "Check input/output value"},
-        {"error": "Short-circuit at the analog input", "remedy": "Check terminal"},
-        {"error": "Measurement overflow or cut wire at the analog input", "remedy": "Check input value and terminal"}
-    ]
-
-    komponenten = ["Sensor", "Motor", "Pumpe", "Ventil", "Steuerung", "Relais", "Kabelbaum", "Netzteil"]
-
-    # Hilfs-Dictionary, um Duplikate zu zählen und Fehler eindeutig zu machen
-    error_counts = {}
-
-    for i, data in enumerate(real_error_data):
-        error = data["error"]
-        remedy = data["remedy"]
-
-        # Prüfe auf Duplikate und mache den Fehlertext eindeutig
-        if error in error_counts:
-            error_counts[error] += 1
-            unique_error = f"{error} ({error_counts[error]})"
-        else:
-            error_counts[error] = 1
-            unique_error = error
+catalog_store = CatalogStore(settings.CATALOG_FILE, settings.CATALOG_RELOAD_INTERVAL, settings.CATALOG_HISTORY_SIZE)
 
-        anzahl_teile = random.randint(1, 3)
-        part_names = [f"{random.choice(komponenten)}-{i+1}.{j+1}" for j in range(anzahl_teile)]
-        
-        error_data[unique_error] = {"remedy": remedy, "parts": part_names}
-        for part_name in part_names:
-            teile_zu_schaltplan[part_name] = f"plan_{part_name.lower().replace(' ', '_')}.pdf"
+def get_catalog() -> Catalog:
+    """Liefert den aktuellen Katalog und stößt bei Dateiänderungen einen Reload an."""
+    catalog_store.check_for_update()
+    return catalog_store.current
 
-    return error_data, teile_zu_schaltplan
+# ==============================================================================
+# Cursor für seitenweise Listen
+# ==============================================================================
+# Der Cursor ist der (undurchsichtig kodierte) kleingeschriebene Name des
+# letzten Benutzers der vorherigen Seite.
+def _encode_cursor(username: str) -> str:
+    return base64.urlsafe_b64encode(username.lower().encode("utf-8")).decode("ascii")
 
-error_data, teile_zu_schaltplan = load_data()
+def _decode_cursor(cursor: str) -> str:
+    try:
+        # validate=True: sonst würden ungültige Zeichen still verworfen ("%%%" -> erste Seite)
+        return base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 # ==============================================================================
 # FastAPI Anwendung
 # ==============================================================================
-app = fastapi.FastAPI()
+@asynccontextmanager
+async def lifespan(app: fastapi.FastAPI):
+    # Auch ohne gunicorn --preload (z.B. uvicorn main:app) vor der ersten Anfrage
+    # aufwärmen; nach warm_up im Master ist hier kaum noch etwas zu tun
+    await run_in_threadpool(warm_up)
+    yield
+
+app = fastapi.FastAPI(lifespan=lifespan)
+# Reine ASGI-Middleware: zählt und misst jede Anfrage pro Routen-Template
+app.add_middleware(metrics.MetricsMiddleware)
+# Außen: lehnt bei zu vielen gleichzeitigen Anfragen ab, bevor Arbeit anfällt
+app.add_middleware(LoadShedder, max_in_flight=settings.MAX_IN_FLIGHT_REQUESTS)
 
 class PartRequest(BaseModel):
     error: str
@@ -199,6 +167,15 @@ class PartRequest(BaseModel):
 class SchematicRequest(BaseModel):
     part: str
 
+# Obergrenze für Batch-Anfragen, damit eine Anfrage den Worker nicht blockiert
+MAX_BATCH_SIZE = 500
+
+class ErrorDetailsRequest(BaseModel):
+    errors: list[str] = Field(max_length=MAX_BATCH_SIZE)
+
+class SchematicsRequest(BaseModel):
+    parts: list[str] = Field(max_length=MAX_BATCH_SIZE)
+
 class UserCreateRequest(BaseModel):
     username: str
     password: str
@@ -207,6 +184,7 @@ class UserCreateRequest(BaseModel):
 class UserUpdateRequest(BaseModel):
     new_password: str | None = None
     new_role: str | None = None
+    disabled: bool | None = None
 
 # ==============================================================================
 # API Endpunkte
@@ -214,11 +192,23 @@ class UserUpdateRequest(BaseModel):
 
 # --- Login Endpunkt ---
 @app.post("/api/login")
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    # Vor bcrypt: je IP und je IP mit Zielkonto begrenzen (gegen Durchprobieren von
+    # Passwörtern); das Konto allein ist kein Schlüssel, sonst könnte jeder es sperren
+    client_ip = _client_ip(request)
+    account_key = f"{client_ip}|{form_data.username.lower()}"
+    _check_rate((login_ip_limiter, client_ip), (login_user_limiter, account_key))
     user = get_user(form_data.username)
-    # Sichere Passwortverifizierung wiederhergestellt
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Sichere Passwortverifizierung wiederhergestellt (bcrypt läuft im Thread-Pool)
+    try:
+        async with login_limiter.slot():
+            password_ok = bool(user) and await verify_password_async(form_data.password, user.hashed_password)
+    except AdmissionRejected:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many login attempts, please retry shortly", headers={"Retry-After": "1"})
+    if not password_ok:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password", headers={"WWW-Authenticate": "Bearer"})
+    # Erfolgreich: bisherige Fehlversuche von dieser Adresse zählen nicht weiter
+    login_user_limiter.reset(account_key)
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -233,32 +223,193 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Zusammengefasst über alle Worker; Prometheus-Textformat 0.0.4
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/api/search_errors")
-async def search_errors(query: str = "", current_user: User = Depends(get_current_active_user)):
+async def search_errors(query: str = "", limit: int = Query(20, ge=1, le=200), offset: int = Query(0, ge=0), current_user: User = Depends(get_current_active_user), rate_limit: None = Depends(limit_search_rate), catalog: Catalog = Depends(get_catalog)):
     if not query:
         return []
-    return [fehler for fehler in error_data.keys() if query.lower() in fehler.lower()]
+    with metrics.timed("search_errors"):
+        return catalog.search_index.search(query, limit=limit, offset=offset)
+
+# --- Suche während der Eingabe über eine dauerhafte Verbindung ---
+# Protokoll (JSON-Nachrichten):
+#   Client: {"type": "auth", "token": "..."}              -> Server: {"type": "ready"}
+#   Client: {"type": "search", "id": 7, "query": "...", "limit": 20}
+#                                                         -> Server: {"type": "results", "id": 7, "query": "...", "results": [...]}
+# Ungültige oder abgelaufene Anmeldung schließt die Verbindung mit WS_UNAUTHORIZED.
+WS_UNAUTHORIZED = 4401
+WS_AUTH_TIMEOUT = 10.0
+
+def _search_message_query(message: dict) -> tuple[str, int]:
+    query = message.get("query")
+    limit = message.get("limit", 20)
+    if not isinstance(query, str):
+        query = ""
+    if not isinstance(limit, int) or isinstance(limit, bool):
+        limit = 20
+    return query, min(max(limit, 1), 200)
+
+def _timed_search(query: str, limit: int) -> list[str]:
+    # get_catalog hier, im Thread-Pool: der erste Zugriff lädt den Katalog
+    catalog = get_catalog()
+    with metrics.timed("search_errors"):
+        return catalog.search_index.search(query, limit=limit)
+
+async def _receive_ws_text(websocket: WebSocket) -> str | None:
+    """Nächste Nachricht als Text; None bei Binärnachrichten (receive_text scheitert daran)."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    return message.get("text")
+
+@app.websocket("/ws/search")
+async def search_websocket(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        text = await asyncio.wait_for(_receive_ws_text(websocket), WS_AUTH_TIMEOUT)
+        auth = None if text is None else json.loads(text)
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError):
+        auth = None
+    token = auth.get("token") if isinstance(auth, dict) else None
+    user = _user_for_token(token) if isinstance(token, str) else None
+    if user is None or user.disabled:
+        await websocket.close(code=WS_UNAUTHORIZED)
+        return
+    await websocket.send_json({"type": "ready"})
+
+    # Nur die jeweils neueste Anfrage wird bearbeitet; was während einer
+    # Bearbeitung (oder Wartezeit) nachkommt, ersetzt ältere Anfragen
+    latest: list[dict | None] = [None]
+    pending = asyncio.Event()
+    client_ip = websocket.client.host if websocket.client else "unknown"
+
+    async def receive():
+        try:
+            while True:
+                text = await _receive_ws_text(websocket)
+                if text is None:
+                    continue
+                try:
+                    message = json.loads(text)
+                except ValueError:
+                    continue
+                if isinstance(message, dict) and message.get("type") == "search":
+                    if latest[0] is not None:
+                        metrics.WS_SEARCH_QUERIES.inc(outcome="superseded")
+                    latest[0] = message
+                    pending.set()
+        except WebSocketDisconnect:
+            pass
+
+    async def process():
+        try:
+            while True:
+                await pending.wait()
+                pending.clear()
+                message, latest[0] = latest[0], None
+                # Pro Anfrage nur ein Cache-Zugriff statt Header-Parsing und JWT-Prüfung;
+                # gelöschte, gesperrte oder abgelaufene Benutzer werden so trotzdem bemerkt
+                current_user = _user_for_token(token)
+                if current_user is None or current_user.disabled:
+                    await websocket.close(code=WS_UNAUTHORIZED)
+                    return
+                retry_after = search_ip_limiter.acquire(client_ip) or search_user_limiter.acquire(current_user.username.lower())
+                if retry_after:
+                    # Statt abzulehnen warten; neuere Eingaben ersetzen diese Anfrage
+                    if latest[0] is None:
+                        latest[0] = message
+                    pending.set()
+                    await asyncio.sleep(retry_after)
+                    continue
+                query, limit = _search_message_query(message)
+                results = []
+                if query:
+                    # Im Thread-Pool, damit währenddessen neue Eingaben ankommen können;
+                    # der Index ist unveränderlich und darf parallel gelesen werden
+                    results = await run_in_threadpool(_timed_search, query, limit)
+                if latest[0] is not None:
+                    # Inzwischen überholt: veraltetes Ergebnis nicht mehr senden
+                    metrics.WS_SEARCH_QUERIES.inc(outcome="superseded")
+                    continue
+                metrics.WS_SEARCH_QUERIES.inc(outcome="answered")
+                await websocket.send_json({"type": "results", "id": message.get("id"), "query": query, "results": results})
+        except WebSocketDisconnect:
+            pass
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(process())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+    for task in done:
+        task.result()
 
 @app.get("/api/all_errors")
-async def get_all_errors(current_user: User = Depends(get_current_active_user)):
-    return sorted(list(error_data.keys()))
+async def get_all_errors(request: Request, current_user: User = Depends(get_current_active_user), catalog: Catalog = Depends(get_catalog)):
+    # Vorberechnete Antwort mit ETag; unveränderte Kataloge kosten nur ein 304
+    return await catalog.all_errors_body.response(request, "private, no-cache")
+
+# --- Katalog für die Offline-Nutzung im Browser ---
+@app.get("/api/catalog/snapshot")
+async def get_catalog_snapshot(request: Request, current_user: User = Depends(get_current_active_user), catalog: Catalog = Depends(get_catalog)):
+    # Ganzer Katalog, versioniert über den Inhalt; unverändert -> 304
+    return await catalog.snapshot_body.response(request, "private, no-cache")
+
+@app.get("/api/catalog/delta")
+async def get_catalog_delta(request: Request, since: str, current_user: User = Depends(get_current_active_user), catalog: Catalog = Depends(get_catalog)):
+    # Vergleich über den ganzen Katalog: im Thread-Pool, nicht im Event-Loop
+    body = await run_in_threadpool(catalog_store.delta_body, catalog, since)
+    if body is None:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Unknown catalog version, load /api/catalog/snapshot")
+    return await body.response(request, "private, no-cache")
 
 @app.post("/api/parts")
-async def get_parts(request: PartRequest, current_user: User = Depends(get_current_active_user)):
-    return error_data.get(request.error, {"remedy": "Keine Daten gefunden.", "parts": []})
+async def get_parts(request: PartRequest, current_user: User = Depends(get_current_active_user), catalog: Catalog = Depends(get_catalog)):
+    return catalog.error_data.get(request.error, {"remedy": "Keine Daten gefunden.", "parts": []})
 
 @app.post("/api/schematic")
-async def get_schematic(request: SchematicRequest, current_user: User = Depends(get_current_active_user)):
-    return {"schematic": teile_zu_schaltplan.get(request.part)}
+async def get_schematic(request: SchematicRequest, current_user: User = Depends(get_current_active_user), catalog: Catalog = Depends(get_catalog)):
+    return {"schematic": catalog.teile_zu_schaltplan.get(request.part)}
+
+@app.post("/api/error_detail")
+async def get_error_detail(request: PartRequest, current_user: User = Depends(get_current_active_user), catalog: Catalog = Depends(get_catalog)):
+    """Lösung, Teile und Schaltpläne eines Fehlers mit einer einzigen Anfrage."""
+    return catalog.detail(request.error)
+
+@app.post("/api/error_details")
+async def get_error_details(request: ErrorDetailsRequest, current_user: User = Depends(get_current_active_user), catalog: Catalog = Depends(get_catalog)):
+    """Wie /api/error_detail für viele Fehler auf einmal."""
+    return {"results": {error: catalog.detail(error) for error in request.errors}}
+
+@app.post("/api/schematics")
+async def get_schematics(request: SchematicsRequest, current_user: User = Depends(get_current_active_user), catalog: Catalog = Depends(get_catalog)):
+    """Schaltpläne für viele Teile auf einmal (unbekannte Teile -> null)."""
+    return {"schematics": {part: catalog.teile_zu_schaltplan.get(part) for part in request.parts}}
 
 # --- Admin-spezifischer Endpunkt (Beispiel) ---
 @app.get("/api/admin/check")
 async def admin_check(is_admin_user: bool = Depends(is_admin)):
     return {"message": "Welcome, Admin! You have access to special settings."}
 
+@app.post("/api/admin/catalog/reload")
+async def reload_catalog(is_admin_user: bool = Depends(is_admin)):
+    """Lädt die Katalogdatei neu, ohne laufende Anfragen zu unterbrechen."""
+    try:
+        catalog = await run_in_threadpool(catalog_store.reload)
+    except CatalogError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    return {"message": "Catalog reloaded.", "version": catalog.version, "errors": len(catalog.error_data)}
+
 @app.post("/api/admin/users", status_code=status.HTTP_201_CREATED)
 async def create_user(user_data: UserCreateRequest, is_admin_user: bool = Depends(is_admin)):
-    hashed_password = pwd_context.hash(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     user_in_db = UserInDB(
         username=user_data.username,
         hashed_password=hashed_password,
@@ -272,13 +423,50 @@ async def create_user(user_data: UserCreateRequest, is_admin_user: bool = Depend
         )
     return {"message": f"User '{user_data.username}' created successfully."}
 
+@app.post("/api/admin/users/bulk", status_code=status.HTTP_201_CREATED)
+async def create_users_bulk(users_data: Annotated[list[UserCreateRequest], Field(max_length=MAX_BATCH_SIZE)], is_admin_user: bool = Depends(is_admin)):
+    """Legt viele Benutzer auf einmal an; gespeichert wird mit einem einzigen Schreibvorgang."""
+    # Vor dem (teuren) Hashing aussortieren: vorhandene Namen und Wiederholungen
+    # im Batch (pro Name zählt das erste Vorkommen)
+    seen = set()
+    new_users, skipped = [], []
+    for user_data in users_data:
+        key = user_data.username.lower()
+        if key in seen or get_user(user_data.username) is not None:
+            skipped.append(user_data.username)
+        else:
+            seen.add(key)
+            new_users.append(user_data)
+    hashed_passwords = await hash_passwords_bulk_async([user_data.password for user_data in new_users])
+    users_in_db = [
+        UserInDB(username=user_data.username, hashed_password=hashed_password, role=user_data.role)
+        for user_data, hashed_password in zip(new_users, hashed_passwords)
+    ]
+    created = add_users(users_in_db)
+    # Während des Hashings von anderer Seite angelegte Namen
+    created_keys = {username.lower() for username in created}
+    skipped.extend(user.username for user in users_in_db if user.username.lower() not in created_keys)
+    return {"message": f"{len(created)} users created.", "created": created, "skipped": skipped}
+
 @app.get("/api/admin/users", response_model=list[User])
-async def read_users(is_admin_user: bool = Depends(is_admin)):
-    return get_all_users()
+async def read_users(response: Response, limit: int = Query(100, ge=1, le=1000), cursor: str | None = None, is_admin_user: bool = Depends(is_admin)):
+    """
+    Eine Seite der Benutzerliste. Gibt es weitere Benutzer, steht der Cursor
+    für die nächste Seite im Header X-Next-Cursor.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    users = get_users_page(after, limit + 1)
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(users[-1].username)
+    return users
 
 @app.put("/api/admin/users/{username}")
 async def update_user(username: str, update_data: UserUpdateRequest, is_admin_user: bool = Depends(is_admin)):
-    if not update_user_data(username, update_data.dict(exclude_unset=True)):
+    data = update_data.dict(exclude_unset=True)
+    if data.get("new_password"):
+        data["new_hashed_password"] = await hash_password_async(data.pop("new_password"))
+    if not update_user_data(username, data):
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": f"User '{username}' updated successfully."}
 
@@ -292,21 +480,57 @@ async def remove_user(username: str, is_admin_user: bool = Depends(is_admin)):
 
 @app.get("/api/admin/backup/users")
 async def backup_users(is_admin_user: bool = Depends(is_admin)):
-    """Stellt die users.json Datei als Download bereit."""
-    db_file_path = os.path.join(os.path.dirname(__file__), "users.json")
-    if not os.path.exists(db_file_path):
-        raise HTTPException(status_code=404, detail="Users file not found.")
-    return FileResponse(path=db_file_path, filename="users_backup.json", media_type='application/json')
+    """Stellt alle Benutzer im Format der users.json als Download bereit (konsistenter Stand, gestreamt)."""
+    def generate():
+        separator = "{\n"
+        for record in iter_user_records():
+            yield f"{separator}    {json.dumps(record['username'])}: {json.dumps(record)}"
+            separator = ",\n"
+        yield "{}" if separator == "{\n" else "\n}\n"
+    return StreamingResponse(generate(), media_type="application/json", headers={"Content-Disposition": 'attachment; filename="users_backup.json"'})
+
+@app.get("/api/admin/export/users.ndjson")
+async def export_users_ndjson(is_admin_user: bool = Depends(is_admin)):
+    """Alle Benutzer als NDJSON (eine Zeile pro Benutzer) aus einem festen Zeitpunkt."""
+    lines = (json.dumps(record) + "\n" for record in iter_user_records())
+    return StreamingResponse(lines, media_type="application/x-ndjson", headers={"Content-Disposition": 'attachment; filename="users.ndjson"'})
+
+@app.get("/api/admin/export/errors.ndjson")
+async def export_errors_ndjson(is_admin_user: bool = Depends(is_admin), catalog: Catalog = Depends(get_catalog)):
+    """Der Fehlerkatalog als NDJSON; ein späterer Reload ändert einen laufenden Export nicht."""
+    lines = (json.dumps(catalog.detail(error), ensure_ascii=False) + "\n" for error in catalog.error_data)
+    return StreamingResponse(lines, media_type="application/x-ndjson", headers={"Content-Disposition": 'attachment; filename="errors.ndjson"', "X-Catalog-Version": catalog.version})
 
 # Statische Dateien und die Haupt-HTML-Datei bereitstellen
+# (beim Start geladen, vorab komprimiert und mit ETag/Cache-Control ausgeliefert)
 script_dir = os.path.dirname(os.path.abspath(__file__))
 static_dir = os.path.join(script_dir, "static")
+static_assets = StaticAssets(static_dir)
+index_page = static_assets.render_page("index.html")
 
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def static_file(path: str, request: Request):
+    response = await static_assets.response(request, path)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
 
 @app.get("/")
-async def read_root():
-    return FileResponse(os.path.join(static_dir, 'index.html'))
+async def read_root(request: Request):
+    return await index_page.response(request)
+
+def warm_up():
+    """
+    Lädt alles, was sonst erst bei der ersten Anfrage entsteht: Katalog mit
+    Suchindex, Benutzerdatenbank, bcrypt-Backend und komprimierte Dateien.
+    Mit gunicorn --preload läuft das einmal im Master (siehe gunicorn.conf.py),
+    die Worker teilen sich den Speicher danach per copy-on-write. Sonst beim
+    Start jedes Prozesses (lifespan).
+    """
+    catalog_store.current  # lädt den Katalog und erzeugt seine Antworten
+    warm_up_users()
+    static_assets.warm_up()
+    index_page.warm_up()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="localhost", port=8003)
@@ -0,0 +1,416 @@
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # nicht unter Windows; dann ohne Zusammenfassen beendeter Prozesse
+    fcntl = None
+
+# ==============================================================================
+# Metriken im Prometheus-Textformat
+# ==============================================================================
+# Jeder Prozess zählt im eigenen Speicher und schreibt seinen Stand regelmäßig
+# (FLUSH_INTERVAL) als Datei in ein gemeinsames Verzeichnis. /metrics liest in
+# jedem Worker alle Dateien und fasst sie zusammen:
+#   - Counter und Histogramme werden summiert (auch von beendeten Workern,
+#     damit die Werte monoton bleiben),
+#   - Gauges liefern den größten Wert der noch laufenden Prozesse.
+# Dateien beendeter Prozesse werden beim Abruf in AGGREGATE_FILE zusammengefasst
+# und gelöscht, damit das Verzeichnis bei Worker-Neustarts nicht wächst.
+# Das Verzeichnis ist METRICS_DIR (gunicorn.conf.py legt eines pro Master an);
+# ist es leer, bleiben die Metriken im Prozess und /metrics zeigt nur dessen
+# eigene Werte (für uvicorn --workers daher ein Verzeichnis setzen).
+
+FLUSH_INTERVAL = 1.0
+AGGREGATE_FILE = "aggregate.json"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(labelnames, labelvalues, extra=()) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), chr(92) + "n")}"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Pro Label-Kombination: [Anzahl je Bucket (nicht kumuliert) ..., +Inf, Summe]
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [[list(key), list(value)] for key, value in self._values.items()]
+
+
+# ==============================================================================
+# Registry und prozessübergreifende Zusammenführung
+# ==============================================================================
+class Registry:
+    def __init__(self, directory: str | None = None):
+        self._metrics: list[_Metric] = []
+        self._directory = directory
+        self._pid = None
+        self._file = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    @property
+    def directory(self) -> str | None:
+        """Gemeinsames Verzeichnis oder None, wenn nur dieser Prozess zählt."""
+        if self._directory is None:
+            from config import settings
+            return settings.METRICS_DIR or None
+        return self._directory
+
+    def _after_fork_in_child(self):
+        # Werte des Elternprozesses (z.B. gunicorn --preload) gehören nicht zu diesem Worker;
+        # Gauges beschreiben dagegen den geerbten Zustand und bleiben erhalten
+        self._lock = threading.Lock()
+        for metric in self._metrics:
+            metric._lock = threading.Lock()
+            if metric.type_name != "gauge":
+                metric._values.clear()
+
+    def ensure_process(self):
+        """Beim ersten Aufruf in einem Prozess: eigene Datei anlegen und Hintergrund-Thread starten."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            if self.directory is None:
+                self._file = None
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            # Eindeutig pro Prozessstart, damit eine wiederverwendete PID keine Werte überschreibt
+            self._file = os.path.join(self.directory, f"{self._pid}-{uuid.uuid4().hex[:8]}.json")
+            threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "metrics": {metric.name: metric.samples() for metric in self._metrics},
+        }
+
+    def flush(self):
+        """Schreibt den Stand dieses Prozesses atomar in das Metrik-Verzeichnis."""
+        self.ensure_process()
+        if self._file is None:
+            return
+        data = json.dumps(self._snapshot(), separators=(",", ":"))
+        tmp_path = f"{self._file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self._file)
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _read_state(self, name: str) -> dict | None:
+        try:
+            with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _collect(self) -> tuple[dict[str, dict], list[str]]:
+        """
+        Stände aller Prozesse nach Dateiname (der eigene direkt aus dem Speicher)
+        und die Dateien, die bereits zusammengefasst, aber noch nicht gelöscht sind.
+        """
+        self.ensure_process()
+        if self._file is None:
+            return {"": self._snapshot()}, []
+        own = os.path.basename(self._file)
+        states = {own: self._snapshot()}
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith(".json") or name in (own, AGGREGATE_FILE):
+                continue
+            state = self._read_state(name)
+            if state is not None:
+                states[name] = state
+        # Zuletzt lesen: eine gleichzeitige Zusammenfassung schreibt erst die
+        # Sammeldatei und löscht danach; bereits enthaltene Dateien überspringen
+        aggregate = self._read_state(AGGREGATE_FILE)
+        leftovers = []
+        if aggregate is not None:
+            for name in aggregate.get("merged", []):
+                if states.pop(name, None) is not None:
+                    leftovers.append(name)
+            states[AGGREGATE_FILE] = aggregate
+        return states, leftovers
+
+    def _merge(self, metric: _Metric, merged: dict, samples: list):
+        """Addiert Counter- bzw. Histogramm-Werte eines Prozesses auf merged."""
+        for labelvalues, value in samples:
+            key = tuple(labelvalues)
+            if metric.type_name == "histogram":
+                current = merged.get(key, [0] * len(value))
+                merged[key] = [a + b for a, b in zip(current, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+
+    def _compact(self, names: list[str]):
+        """
+        Fasst die Dateien beendeter Prozesse in AGGREGATE_FILE zusammen und löscht
+        sie. Gauges beendeter Prozesse zählen ohnehin nicht mehr und entfallen.
+        Immer nur ein Prozess zur Zeit; die anderen überspringen die Aufgabe.
+        """
+        if fcntl is None:
+            return
+        lock_fd = os.open(os.path.join(self.directory, ".compact.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            aggregate = self._read_state(AGGREGATE_FILE) or {"pid": None, "metrics": {}, "merged": []}
+            # Nach einem Abbruch zwischen Schreiben und Löschen stehen Dateien schon in "merged"
+            merged_names = [name for name in aggregate.get("merged", []) if os.path.exists(os.path.join(self.directory, name))]
+            totals = {
+                metric.name: {tuple(key): value for key, value in aggregate["metrics"].get(metric.name, [])}
+                for metric in self._metrics if metric.type_name != "gauge"
+            }
+            for name in names:
+                if name in merged_names:
+                    continue
+                state = self._read_state(name)
+                if state is None:
+                    continue
+                for metric in self._metrics:
+                    if metric.type_name != "gauge":
+                        self._merge(metric, totals[metric.name], state["metrics"].get(metric.name, []))
+                merged_names.append(name)
+            aggregate = {
+                "pid": None,
+                "metrics": {name: [[list(key), value] for key, value in values.items()] for name, values in totals.items()},
+                "merged": merged_names,
+            }
+            tmp_path = os.path.join(self.directory, f"{AGGREGATE_FILE}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(aggregate, separators=(",", ":")))
+            os.replace(tmp_path, os.path.join(self.directory, AGGREGATE_FILE))
+            for name in merged_names:
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+        finally:
+            os.close(lock_fd)
+
+    def render(self) -> str:
+        """Alle Metriken aller Prozesse im Prometheus-Textformat."""
+        states, leftovers = self._collect()
+        alive = {name: state["pid"] is not None and _pid_alive(state["pid"]) for name, state in states.items()}
+        lines = []
+        for metric in self._metrics:
+            merged: dict[tuple, object] = {}
+            for name, state in states.items():
+                samples = state["metrics"].get(metric.name, [])
+                if metric.type_name != "gauge":
+                    self._merge(metric, merged, samples)
+                elif alive[name]:
+                    for labelvalues, value in samples:
+                        key = tuple(labelvalues)
+                        merged[key] = max(merged.get(key, value), value)
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for key in sorted(merged):
+                value = merged[key]
+                if metric.type_name == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                        cumulative += count
+                        labels = _format_labels(metric.labelnames, key, [("le", _format_value(bound))])
+                        lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f"{metric.name}_sum{labels} {_format_value(value[-1])}")
+                    lines.append(f"{metric.name}_count{labels} {cumulative}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+        dead = [name for name, state in states.items() if name != AGGREGATE_FILE and not alive[name]]
+        if dead or leftovers:
+            self._compact(dead)
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+REGISTRY = Registry()
+
+# ==============================================================================
+# Metriken der Anwendung
+# ==============================================================================
+HTTP_REQUESTS = Counter(
+    "wartungshilfe_http_requests_total", "HTTP-Anfragen nach Route, Methode und Status.",
+    ("method", "route", "status"),
+)
+HTTP_LATENCY = Histogram(
+    "wartungshilfe_http_request_duration_seconds", "Bearbeitungszeit von HTTP-Anfragen.",
+    ("method", "route"),
+)
+HOT_PATH_LATENCY = Histogram(
+    "wartungshilfe_operation_duration_seconds",
+    "Dauer einzelner teurer Operationen (verify_password, jwt_decode, search_errors, save_db).",
+    ("operation",),
+)
+RATE_LIMITED = Counter(
+    "wartungshilfe_rate_limited_total", "Wegen Rate-Limit abgelehnte Anfragen (429).", ("limiter",),
+)
+SHED_REQUESTS = Counter(
+    "wartungshilfe_shed_requests_total", "Wegen Überlast abgelehnte Anfragen (503).",
+)
+WS_SEARCH_QUERIES = Counter(
+    "wartungshilfe_ws_search_queries_total",
+    "Suchanfragen über /ws/search: beantwortet oder durch eine neuere ersetzt.", ("outcome",),
+)
+CATALOG_ERRORS = Gauge("wartungshilfe_catalog_errors", "Anzahl der Fehler im geladenen Katalog.")
+CATALOG_INFO = Gauge("wartungshilfe_catalog_info", "Geladene Katalogversion (Wert immer 1).", ("version",))
+
+
+def timed(operation: str):
+    """Kontextmanager, der die Dauer einer Operation in HOT_PATH_LATENCY erfasst."""
+    return HOT_PATH_LATENCY.time(operation=operation)
+
+
+def set_catalog(version: str, size: int):
+    CATALOG_ERRORS.set(size)
+    CATALOG_INFO.reset()
+    CATALOG_INFO.set(1, version=version)
+
+
+# ==============================================================================
+# ASGI-Middleware für Anfragen
+# ==============================================================================
+class MetricsMiddleware:
+    """Zählt jede HTTP-Anfrage und misst ihre Dauer, gruppiert nach Routen-Template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        REGISTRY.ensure_process()
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Der Router trägt die gefundene Route in den Scope ein
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route_path)
+            HTTP_REQUESTS.inc(method=method, route=route_path, status=status_code)
@@ -0,0 +1,295 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+
+# ==============================================================================
+# Suchindex für Fehlermeldungen
+# ==============================================================================
+# Der Index wird einmalig aus dem Katalog aufgebaut und danach nur noch gelesen.
+# Er besteht aus
+#   - den vorab kleingeschriebenen Texten aller Einträge,
+#   - einem Bi-/Trigramm-Index (Gramm -> Eintrags-IDs) für Teilstring- und
+#     Tippfehler-Suche,
+#   - einem sortierten Wortverzeichnis (Wort -> Eintrags-IDs) für die
+#     Präfixsuche über Wortanfänge und die Tippfehler-Korrektur einzelner Wörter.
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Erlaubte Tippfehler (Editierdistanz) pro Wort, abhängig von der Wortlänge
+TYPO_MIN_LENGTH = 4
+TYPO_TWO_MIN_LENGTH = 8
+
+
+def _normalize(text: str) -> str:
+    return text.casefold()
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _bigrams(text: str) -> set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _occurrences(text: str, query: str):
+    """Alle Startpositionen von query in text (ab dem zweiten Zeichen)."""
+    pos = text.find(query, 1)
+    while pos != -1:
+        yield pos
+        pos = text.find(query, pos + 1)
+
+
+def _max_typos(word: str) -> int:
+    if len(word) >= TYPO_TWO_MIN_LENGTH:
+        return 2
+    if len(word) >= TYPO_MIN_LENGTH:
+        return 1
+    return 0
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Editierdistanz mit Vertauschung benachbarter Zeichen (Optimal String
+    Alignment). Bricht ab, sobald limit sicher überschritten ist.
+    """
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Invertierter Index über eine feste Menge von Fehlermeldungen."""
+
+    def __init__(self, entries):
+        # Die IDs folgen der Sortierung innerhalb einer Rangstufe (kürzere Texte
+        # zuerst, dann alphabetisch). Die besten Treffer einer Stufe sind damit
+        # einfach die kleinsten IDs.
+        self.entries: list[str] = sorted(entries, key=lambda e: (len(e), _normalize(e), e))
+        self._lowered: list[str] = [_normalize(e) for e in self.entries]
+        self._exact: dict[str, int] = {}
+        for entry_id, text in enumerate(self._lowered):
+            self._exact.setdefault(text, entry_id)
+
+        # Alphabetisch sortierte Texte für die Präfixsuche über den Textanfang
+        by_text = sorted(range(len(self._lowered)), key=self._lowered.__getitem__)
+        self._sorted_texts: list[str] = [self._lowered[i] for i in by_text]
+        self._sorted_ids = array("I", by_text)
+
+        grams: dict[str, list[int]] = {}
+        words: dict[str, list[int]] = {}
+        for entry_id, text in enumerate(self._lowered):
+            # Bigramme decken zweistellige Anfragen ab, Trigramme alle längeren
+            for gram in _bigrams(text) | _trigrams(text):
+                grams.setdefault(gram, []).append(entry_id)
+            for word in set(_TOKEN_RE.findall(text)):
+                words.setdefault(word, []).append(entry_id)
+
+        # array('I') statt Listen hält den Speicherbedarf auch bei großen Katalogen klein
+        self._grams: dict[str, array] = {g: array("I", ids) for g, ids in grams.items()}
+        self._vocabulary: list[str] = sorted(words)
+        self._word_ids: list[array] = [array("I", words[w]) for w in self._vocabulary]
+        self._vocabulary_positions: dict[str, int] = {w: pos for pos, w in enumerate(self._vocabulary)}
+        vocabulary_grams: dict[str, list[int]] = {}
+        for pos, word in enumerate(self._vocabulary):
+            for gram in _trigrams(f" {word} "):
+                vocabulary_grams.setdefault(gram, []).append(pos)
+        self._vocabulary_grams: dict[str, array] = {g: array("I", ids) for g, ids in vocabulary_grams.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    # --------------------------------------------------------------------------
+    # Trefferstufen
+    # --------------------------------------------------------------------------
+    def _prefix_ids(self, query: str) -> list[int]:
+        """Einträge, deren Text mit der Anfrage beginnt."""
+        texts = self._sorted_texts
+        pos = bisect_left(texts, query)
+        end = pos
+        while end < len(texts) and texts[end].startswith(query):
+            end += 1
+        return self._sorted_ids[pos:end].tolist()
+
+    def _word_prefix_range(self, prefix: str) -> range:
+        """Positionen im Wortverzeichnis, deren Wort mit prefix beginnt."""
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + "\U0010ffff", start)
+        return range(start, end)
+
+    def _word_prefix_ids(self, prefix: str) -> set[int]:
+        """Alle Einträge, die ein Wort mit dem gegebenen Präfix enthalten."""
+        ids: set[int] = set()
+        for pos in self._word_prefix_range(prefix):
+            ids.update(self._word_ids[pos])
+        return ids
+
+    def _word_start_ids(self, query: str, substring_ids) -> set[int] | list[int]:
+        """Einträge, in denen die Anfrage an einem Wortanfang vorkommt."""
+        words = _TOKEN_RE.findall(query)
+        if not words or not query[0].isalnum():
+            return []
+        if query == words[0]:
+            # Einzelnes Wort: direkt aus dem Wortverzeichnis
+            return self._word_prefix_ids(query)
+        lowered = self._lowered
+        return [
+            i for i in substring_ids()
+            if lowered[i].startswith(query)
+            or any(not lowered[i][pos - 1].isalnum() for pos in _occurrences(lowered[i], query))
+        ]
+
+    def _substring_ids(self, query: str) -> list[int]:
+        """Einträge, die die Anfrage als Teilstring enthalten."""
+        lowered = self._lowered
+        if len(query) < 2:
+            # Einzelne Zeichen sind nicht indiziert; die vorab kleingeschriebenen
+            # Texte werden direkt durchsucht.
+            return [i for i, text in enumerate(lowered) if query in text]
+        postings = []
+        for gram in (_trigrams(query) or {query}):
+            ids = self._grams.get(gram)
+            if ids is None:
+                return []
+            postings.append(ids)
+        # Die kürzeste Posting-Liste enthält bereits alle Kandidaten
+        candidates = min(postings, key=len)
+        return [i for i in candidates if query in lowered[i]]
+
+    def _all_words_ids(self, query: str) -> set[int]:
+        """Einträge, die jedes Wort der Anfrage als Wortanfang enthalten, in beliebiger Reihenfolge."""
+        words = _TOKEN_RE.findall(query)
+        if len(words) < 2:
+            return set()
+        # Mit dem seltensten Wort beginnen, damit die Schnittmengen klein bleiben
+        sizes = []
+        for word in words:
+            positions = self._word_prefix_range(word)
+            if not positions:
+                return set()
+            sizes.append((sum(len(self._word_ids[p]) for p in positions), word))
+        sizes.sort()
+        matches = self._word_prefix_ids(sizes[0][1])
+        for _, word in sizes[1:]:
+            if not matches:
+                break
+            matches &= self._word_prefix_ids(word)
+        return matches
+
+    def _similar_words(self, word: str, is_prefix: bool) -> list[int]:
+        """
+        Positionen im Wortverzeichnis, die sich von word um höchstens
+        _max_typos(word) Zeichen unterscheiden. Bei is_prefix wird word als
+        Anfang eines längeren Wortes verglichen (das Wort wird gerade getippt).
+        """
+        budget = _max_typos(word)
+        if budget == 0:
+            return []
+        # Vorauswahl über gemeinsame Trigramme, damit nicht das ganze Verzeichnis
+        # mit der Editierdistanz verglichen werden muss
+        candidates: set[int] = set()
+        for gram in _trigrams(f" {word} "):
+            candidates.update(self._vocabulary_grams.get(gram, ()))
+        if is_prefix:
+            # Das getippte Wort kann einem beliebig langen Wortanfang entsprechen
+            lengths = range(max(1, len(word) - budget), len(word) + budget + 1)
+        else:
+            lengths = (None,)
+        similar = []
+        for pos in candidates:
+            other = self._vocabulary[pos]
+            for length in lengths:
+                candidate = other if length is None else other[:length]
+                if abs(len(candidate) - len(word)) <= budget and _edit_distance(word, candidate, budget) <= budget:
+                    similar.append(pos)
+                    break
+        return similar
+
+    def _fuzzy_ids(self, query: str) -> set[int]:
+        """Einträge, die alle Wörter der Anfrage bis auf wenige Tippfehler enthalten."""
+        words = _TOKEN_RE.findall(query)
+        if not words:
+            return set()
+        last_is_prefix = query[-1].isalnum()
+        groups = []
+        for n, word in enumerate(words):
+            is_prefix = last_is_prefix and n == len(words) - 1
+            positions = list(self._word_prefix_range(word)) if is_prefix else []
+            if not positions and word in self._vocabulary_positions:
+                positions = [self._vocabulary_positions[word]]
+            if not positions:
+                positions = self._similar_words(word, is_prefix)
+                if not positions:
+                    return set()
+            groups.append((sum(len(self._word_ids[p]) for p in positions), positions))
+        # Mit der kleinsten Treffermenge beginnen
+        groups.sort(key=lambda group: group[0])
+        matches: set[int] | None = None
+        for _, positions in groups:
+            ids: set[int] = set()
+            for pos in positions:
+                ids.update(self._word_ids[pos])
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                break
+        return matches or set()
+
+    # --------------------------------------------------------------------------
+    # Suche
+    # --------------------------------------------------------------------------
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> list[str]:
+        """
+        Liefert die passendsten Einträge für eine Anfrage, sortiert nach Relevanz:
+        exakter Treffer, Anfang des Textes, Anfang eines Wortes, beliebiger
+        Teilstring, alle Wörter als Präfix vorhanden, Tippfehler-Treffer.
+        Innerhalb einer Stufe kommen kürzere Texte zuerst.
+        """
+        query = _normalize(query).strip()
+        if not query or limit <= 0:
+            return []
+        wanted = offset + limit
+        found: list[int] = []
+        seen: set[int] = set()
+
+        def take(ids):
+            # Übernimmt die besten noch nicht gesehenen IDs einer Stufe
+            fresh = [i for i in ids if i not in seen]
+            for i in heapq.nsmallest(wanted - len(found), fresh):
+                found.append(i)
+                seen.add(i)
+
+        substring_cache: list[list[int]] = []
+
+        def substring_ids():
+            if not substring_cache:
+                substring_cache.append(self._substring_ids(query))
+            return substring_cache[0]
+
+        # Die Stufen werden nacheinander berechnet; teurere Stufen entfallen,
+        # sobald genügend Treffer vorliegen.
+        tiers = (
+            lambda: [self._exact[query]] if query in self._exact else [],
+            lambda: self._prefix_ids(query),
+            lambda: self._word_start_ids(query, substring_ids),
+            substring_ids,
+            lambda: self._all_words_ids(query),
+            # Tippfehler-Toleranz nur, wenn die exakten Treffer nicht ausreichen
+            lambda: self._fuzzy_ids(query),
+        )
+        for tier in tiers:
+            if len(found) >= wanted:
+                break
+            take(tier())
+
+        return [self.entries[i] for i in found[offset:wanted]]
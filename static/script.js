@@ -23,6 +23,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const addUserStatus = document.getElementById('add-user-status');
     const userManagementSection = document.getElementById('user-management-section');
     const userTableBody = document.getElementById('user-table-body');
+    const loadMoreUsersButton = document.getElementById('load-more-users-button');
     const backupUsersButton = document.getElementById('backup-users-button');
 
     // --- Modal Elemente ---
@@ -37,6 +38,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let userRole = localStorage.getItem('userRole');
 
     function showLogin() {
+        closeSearchSocket();
         loginContainer.style.display = 'block';
         appContainer.style.display = 'none';
         localStorage.removeItem('accessToken');
@@ -59,7 +61,7 @@ document.addEventListener('DOMContentLoaded', () => {
             userManagementSection.style.display = 'none';
         }
 
-        loadAllErrorsDropdown();
+        loadCatalog();
     }
 
     loginForm.addEventListener('submit', (e) => {
@@ -126,24 +128,202 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- Füllt das Dropdown-Menü mit allen Fehlern ---
+    function fillErrorDropdown(errors) {
+        errorDropdown.innerHTML = '<option value="">-- Aus Liste wählen --</option>';
+        errors.forEach(error => {
+            const option = document.createElement('option');
+            option.value = error;
+            option.textContent = error;
+            errorDropdown.appendChild(option);
+        });
+        errorDropdown.disabled = false;
+    }
+
+    // Rückfall ohne lokalen Katalog: Liste vom Server
     function loadAllErrorsDropdown() {
         apiFetch('/api/all_errors')
-            .then(errors => {
-                errorDropdown.innerHTML = '<option value="">-- Aus Liste wählen --</option>';
-                errors.forEach(error => {
-                    const option = document.createElement('option');
-                    option.value = error;
-                    option.textContent = error;
-                    errorDropdown.appendChild(option);
-                });
-                errorDropdown.disabled = false;
-            })
+            .then(fillErrorDropdown)
             .catch(error => {
                 console.error('Fehler beim Laden der Fehlerliste:', error);
                 errorDropdown.innerHTML = '<option>Laden fehlgeschlagen</option>';
             });
     }
 
+    // --- Katalog lokal im Browser (IndexedDB) ---
+    // Der ganze Katalog wird einmal geladen und danach nur um Änderungen ergänzt
+    // (/api/catalog/delta). Suche, Fehlerliste, Teile und Schaltpläne kommen dann
+    // aus dem Browser und funktionieren auch bei schlechter Verbindung.
+    const CATALOG_DB = 'wartungshilfe';
+    const CATALOG_DB_STORE = 'catalog';
+    const CATALOG_SYNC_INTERVAL_MS = 5 * 60 * 1000;
+    const LOCAL_SEARCH_LIMIT = 20;
+    let catalogSnapshot = null; // Stand wie von /api/catalog/snapshot
+    let localCatalog = null;    // daraus aufgebaute Nachschlagetabellen
+
+    function openCatalogDb() {
+        return new Promise((resolve, reject) => {
+            if (!('indexedDB' in window)) {
+                reject(new Error('IndexedDB nicht verfügbar'));
+                return;
+            }
+            const request = indexedDB.open(CATALOG_DB, 1);
+            request.onupgradeneeded = () => request.result.createObjectStore(CATALOG_DB_STORE);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function readCachedCatalog() {
+        return openCatalogDb().then(db => new Promise((resolve, reject) => {
+            const request = db.transaction(CATALOG_DB_STORE).objectStore(CATALOG_DB_STORE).get('snapshot');
+            request.onsuccess = () => resolve(request.result || null);
+            request.onerror = () => reject(request.error);
+        }));
+    }
+
+    function writeCachedCatalog(snapshot) {
+        return openCatalogDb().then(db => new Promise((resolve, reject) => {
+            const transaction = db.transaction(CATALOG_DB_STORE, 'readwrite');
+            transaction.objectStore(CATALOG_DB_STORE).put(snapshot, 'snapshot');
+            transaction.oncomplete = () => resolve();
+            transaction.onerror = () => reject(transaction.error);
+        }));
+    }
+
+    // Liefert null bei 410 (Stand auf dem Server unbekannt -> ganzer Snapshot)
+    function catalogFetch(url) {
+        return fetch(url, { headers: getAuthHeaders() }).then(response => {
+            if (response.status === 410) {
+                return null;
+            }
+            if (response.status === 401) {
+                showLogin();
+                throw new Error('Session abgelaufen. Bitte neu anmelden.');
+            }
+            if (!response.ok) {
+                throw new Error('Netzwerkfehler oder Server-Problem.');
+            }
+            return response.json();
+        });
+    }
+
+    function applyCatalogDelta(snapshot, delta) {
+        const errors = new Map(snapshot.errors.map(row => [row[0], row]));
+        delta.removed_errors.forEach(error => errors.delete(error));
+        delta.errors.forEach(row => errors.set(row[0], row));
+        const parts = { ...snapshot.parts };
+        delta.removed_parts.forEach(part => delete parts[part]);
+        Object.assign(parts, delta.parts);
+        return {
+            version: delta.version,
+            catalog_version: delta.catalog_version,
+            errors: Array.from(errors.values()),
+            parts: parts
+        };
+    }
+
+    function useCatalog(snapshot) {
+        const errors = new Map(snapshot.errors.map(([error, remedy, parts]) => [error, { remedy, parts }]));
+        // Reihenfolge wie auf dem Server: kürzere (genauere) Treffer zuerst
+        const entries = Array.from(errors.keys()).sort((a, b) => {
+            if (a.length !== b.length) {
+                return a.length - b.length;
+            }
+            const la = a.toLowerCase();
+            const lb = b.toLowerCase();
+            return la < lb ? -1 : la > lb ? 1 : (a < b ? -1 : a > b ? 1 : 0);
+        });
+        catalogSnapshot = snapshot;
+        localCatalog = {
+            errors: errors,
+            parts: new Map(Object.entries(snapshot.parts)),
+            entries: entries,
+            lowered: entries.map(entry => entry.toLowerCase())
+        };
+        fillErrorDropdown(Array.from(errors.keys()).sort());
+    }
+
+    // Holt Änderungen seit dem lokalen Stand (oder den ganzen Katalog) und speichert sie
+    function syncCatalog() {
+        const cached = catalogSnapshot;
+        const request = cached
+            ? catalogFetch(`/api/catalog/delta?since=${encodeURIComponent(cached.version)}`)
+                .then(delta => delta === null ? catalogFetch('/api/catalog/snapshot') : applyCatalogDelta(cached, delta))
+            : catalogFetch('/api/catalog/snapshot');
+        return request.then(snapshot => {
+            if (!snapshot || (cached && snapshot.version === cached.version)) {
+                return;
+            }
+            useCatalog(snapshot);
+            return writeCachedCatalog(snapshot)
+                .catch(error => console.error('Katalog konnte nicht lokal gespeichert werden:', error));
+        });
+    }
+
+    function loadCatalog() {
+        readCachedCatalog()
+            .catch(() => null)
+            .then(cached => {
+                if (cached && !localCatalog) {
+                    useCatalog(cached);
+                }
+                return syncCatalog();
+            })
+            .catch(error => {
+                console.error('Katalog konnte nicht aktualisiert werden:', error);
+                if (!localCatalog) {
+                    loadAllErrorsDropdown();
+                }
+            });
+    }
+
+    function periodicCatalogSync() {
+        if (token && catalogSnapshot) {
+            syncCatalog().catch(error => console.error('Katalog konnte nicht aktualisiert werden:', error));
+        }
+    }
+    setInterval(periodicCatalogSync, CATALOG_SYNC_INTERVAL_MS);
+    window.addEventListener('online', periodicCatalogSync);
+
+    function isWordStart(text, query) {
+        for (let pos = text.indexOf(query); pos >= 0; pos = text.indexOf(query, pos + 1)) {
+            if (pos === 0 || !/[\p{L}\p{N}]/u.test(text[pos - 1])) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    // Suche im lokalen Katalog: exakt, Anfang, Wortanfang, irgendwo enthalten
+    function searchLocalCatalog(query) {
+        const needle = query.trim().toLowerCase();
+        if (!needle) {
+            return [];
+        }
+        const tiers = [[], [], [], []];
+        const { entries, lowered } = localCatalog;
+        for (let i = 0; i < entries.length; i++) {
+            const text = lowered[i];
+            const pos = text.indexOf(needle);
+            if (pos < 0) {
+                continue;
+            }
+            if (text === needle) {
+                tiers[0].push(entries[i]);
+            } else if (pos === 0) {
+                tiers[1].push(entries[i]);
+            } else if (isWordStart(text, needle)) {
+                tiers[2].push(entries[i]);
+            } else {
+                tiers[3].push(entries[i]);
+            }
+            if (tiers[0].length + tiers[1].length >= LOCAL_SEARCH_LIMIT) {
+                break;
+            }
+        }
+        return [].concat(...tiers).slice(0, LOCAL_SEARCH_LIMIT);
+    }
+
     // --- Event Listener für das Dropdown-Menü ---
     errorDropdown.addEventListener('change', () => {
         const selectedError = errorDropdown.value;
@@ -168,77 +348,200 @@ document.addEventListener('DOMContentLoaded', () => {
         partSelect.innerHTML = '';
 
         if (query.length < 2) {
+            searchSeq++; // noch ausstehende Antworten nicht mehr anzeigen
             suggestionsBox.innerHTML = '';
             suggestionsBox.style.display = 'none';
             return;
         }
 
+        if (localCatalog) {
+            const results = searchLocalCatalog(query);
+            if (results.length > 0) {
+                searchSeq++; // ausstehende Server-Antworten sind damit überholt
+                showSuggestions(results);
+                return;
+            }
+        }
+        // Nichts lokal gefunden (z.B. Tippfehler): unscharfe Suche auf dem Server
+        requestSuggestions(query);
+    });
+
+    // --- Vorschläge: über WebSocket, REST als Rückfallebene ---
+    // Eine Verbindung pro Sitzung, einmal angemeldet; der Server beantwortet nur
+    // die jeweils neueste Anfrage. Ohne WebSocket (nicht unterstützt, Proxy,
+    // Verbindungsabbruch) wird wie bisher /api/search_errors abgefragt.
+    const SEARCH_SOCKET_RETRY_MS = 30000;
+    let searchSocket = null;
+    let searchSocketReady = false;
+    let searchSocketRetryAt = 0;
+    let searchSeq = 0; // Nummer der neuesten Anfrage; ältere Antworten werden verworfen
+
+    function openSearchSocket() {
+        if (!('WebSocket' in window) || Date.now() < searchSocketRetryAt) {
+            return;
+        }
+        const protocol = location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const socket = new WebSocket(`${protocol}//${location.host}/ws/search`);
+        searchSocket = socket;
+        socket.addEventListener('open', () => {
+            socket.send(JSON.stringify({ type: 'auth', token: token }));
+        });
+        socket.addEventListener('message', event => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'ready') {
+                searchSocketReady = true;
+            } else if (message.type === 'results' && message.id === searchSeq) {
+                showSuggestions(message.results);
+            }
+        });
+        socket.addEventListener('close', event => {
+            if (searchSocket === socket) {
+                searchSocket = null;
+                searchSocketReady = false;
+            }
+            if (event.code === 4401) { // Anmeldung ungültig oder abgelaufen
+                showLogin();
+            } else if (event.code !== 1000) {
+                // Verbindung nicht möglich oder abgebrochen: vorerst REST verwenden
+                searchSocketRetryAt = Date.now() + SEARCH_SOCKET_RETRY_MS;
+            }
+        });
+    }
+
+    function closeSearchSocket() {
+        if (searchSocket) {
+            const socket = searchSocket;
+            searchSocket = null;
+            searchSocketReady = false;
+            socket.close(1000);
+        }
+    }
+
+    function requestSuggestions(query) {
+        const id = ++searchSeq;
+        if (searchSocketReady && searchSocket.readyState === WebSocket.OPEN) {
+            searchSocket.send(JSON.stringify({ type: 'search', id: id, query: query }));
+            return;
+        }
+        if (!searchSocket) {
+            openSearchSocket();
+        }
         apiFetch(`/api/search_errors?query=${encodeURIComponent(query)}`)
             .then(suggestions => {
-                if (suggestions.length > 0) {
-                    suggestionsBox.innerHTML = '';
-                    suggestions.forEach(suggestion => {
-                        const div = document.createElement('div');
-                        div.textContent = suggestion;
-                        div.classList.add('suggestion-item');
-                        div.addEventListener('click', () => {
-                            errorSearch.value = suggestion;
-                            suggestionsBox.style.display = 'none';
-                            fetchParts(suggestion);
-                        });
-                        suggestionsBox.appendChild(div);
-                    });
-                    suggestionsBox.style.display = 'block';
-                } else {
-                    suggestionsBox.style.display = 'none';
+                if (id === searchSeq) {
+                    showSuggestions(suggestions);
                 }
             })
             .catch(error => {
                 console.error('Fehler bei der Fehlersuche:', error);
             });
-    });
+    }
+
+    function showSuggestions(suggestions) {
+        if (suggestions.length > 0) {
+            suggestionsBox.innerHTML = '';
+            suggestions.forEach(suggestion => {
+                const div = document.createElement('div');
+                div.textContent = suggestion;
+                div.classList.add('suggestion-item');
+                div.addEventListener('click', () => {
+                    errorSearch.value = suggestion;
+                    suggestionsBox.style.display = 'none';
+                    fetchParts(suggestion);
+                });
+                suggestionsBox.appendChild(div);
+            });
+            suggestionsBox.style.display = 'block';
+            // Details der obersten Vorschläge gesammelt vorladen, damit ein Klick sofort antwortet
+            prefetchErrorDetails(suggestions.slice(0, 10));
+        } else {
+            suggestionsBox.style.display = 'none';
+        }
+    }
+
+    // --- Zwischenspeicher für Fehlerdetails (Lösung, Teile, Schaltpläne) ---
+    // Ein Eintrag enthält alles, was für die Anzeige eines Fehlers nötig ist;
+    // die Teileauswahl braucht danach keine weitere Anfrage.
+    const errorDetailsCache = new Map();
+    let currentSchematics = new Map();
+
+    let prefetchTimer = null;
+
+    // Lädt Details erst, wenn die Eingabe kurz ruht, statt bei jedem Tastendruck
+    function prefetchErrorDetails(errors) {
+        if (localCatalog) {
+            return; // Details liegen lokal vor
+        }
+        clearTimeout(prefetchTimer);
+        prefetchTimer = setTimeout(() => loadErrorDetails(errors), 300);
+    }
+
+    function loadErrorDetails(errors) {
+        const missing = errors.filter(error => !errorDetailsCache.has(error));
+        if (missing.length === 0) {
+            return;
+        }
+        apiFetch('/api/error_details', {
+            method: 'POST',
+            body: JSON.stringify({ errors: missing })
+        })
+        .then(data => {
+            Object.entries(data.results).forEach(([error, detail]) => errorDetailsCache.set(error, detail));
+        })
+        .catch(error => console.error('Fehler beim Vorladen der Fehlerdetails:', error));
+    }
+
+    function showErrorDetail(detail) {
+        remedyText.textContent = detail.remedy;
+        remedySection.style.display = 'block';
+        currentSchematics = new Map(detail.parts.map(entry => [entry.part, entry.schematic]));
+        partSelect.innerHTML = '<option value="">-- Bitte wählen --</option>';
+        detail.parts.forEach(entry => {
+            const option = document.createElement('option');
+            option.value = entry.part;
+            option.textContent = entry.part;
+            partSelect.appendChild(option);
+        });
+        partsSection.style.display = 'block';
+    }
 
     // --- Funktion zum Abrufen von Teilen und Lösungen ---
     function fetchParts(error) {
-        apiFetch('/api/parts', {
+        resultSection.style.display = 'none';
+        const local = localCatalog && localCatalog.errors.get(error);
+        if (local) {
+            showErrorDetail({
+                error: error,
+                remedy: local.remedy,
+                parts: local.parts.map(part => ({ part: part, schematic: localCatalog.parts.get(part) || null }))
+            });
+            return;
+        }
+        if (errorDetailsCache.has(error)) {
+            showErrorDetail(errorDetailsCache.get(error));
+            return;
+        }
+        apiFetch('/api/error_detail', {
             method: 'POST',
             body: JSON.stringify({ error: error })
         })
-        .then(data => {
-            remedyText.textContent = data.remedy;
-            remedySection.style.display = 'block';
-            partSelect.innerHTML = '<option value="">-- Bitte wählen --</option>';
-            data.parts.forEach(part => {
-                const option = document.createElement('option');
-                option.value = part;
-                option.textContent = part;
-                partSelect.appendChild(option);
-            });
-            partsSection.style.display = 'block';
+        .then(detail => {
+            errorDetailsCache.set(error, detail);
+            showErrorDetail(detail);
         })
         .catch(error => console.error('Fehler beim Laden der Teile:', error));
     }
 
     // --- Event Listener für Teilauswahl ---
+    // Die Schaltpläne wurden mit den Fehlerdetails geladen
     partSelect.addEventListener('change', () => {
-        const selectedPart = partSelect.value;
-        if (!selectedPart) {
+        const schematic = currentSchematics.get(partSelect.value);
+        if (schematic) {
+            schematicResult.textContent = `'${schematic}'`;
+            resultSection.style.display = 'block';
+        } else {
             resultSection.style.display = 'none';
-            return;
         }
-        apiFetch('/api/schematic', {
-            method: 'POST',
-            body: JSON.stringify({ part: selectedPart })
-        })
-        .then(data => {
-            if (data.schematic) {
-                schematicResult.textContent = `'${data.schematic}'`;
-                resultSection.style.display = 'block';
-            } else {
-                resultSection.style.display = 'none';
-            }
-        })
-        .catch(error => console.error('Fehler beim Laden des Schaltplans:', error));
     });
 
     // --- Admin-spezifische Funktionen ---
@@ -280,8 +583,13 @@ document.addEventListener('DOMContentLoaded', () => {
 
     if (backupUsersButton) {
         backupUsersButton.addEventListener('click', () => {
-            apiFetch('/api/admin/backup/users')
-                .then(response => response.blob()) // Die Antwort als Binärdaten (Blob) behandeln
+            fetch('/api/admin/backup/users', { headers: getAuthHeaders() })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error('Netzwerkfehler oder Server-Problem.');
+                    }
+                    return response.blob(); // Die Antwort als Binärdaten (Blob) behandeln
+                })
                 .then(blob => {
                     // Eine temporäre URL für die heruntergeladenen Daten erstellen
                     const url = window.URL.createObjectURL(blob);
@@ -303,29 +611,81 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    function loadUsers() {
-        apiFetch('/api/admin/users')
-            .then(users => {
-                userTableBody.innerHTML = '';
-                users.forEach(user => {
-                    const row = document.createElement('tr');
-                    row.innerHTML = `
-                        <td>${user.username}</td>
-                        <td>${user.role}</td>
-                        <td class="actions">
-                            <button class="edit-btn" data-username="${user.username}" data-role="${user.role}">Bearbeiten</button>
-                            <button class="delete-btn" data-username="${user.username}">Löschen</button>
-                        </td>
-                    `;
-                    userTableBody.appendChild(row);
-                });
+    // Lädt die Benutzerliste seitenweise; der Server liefert den Cursor der
+    // nächsten Seite im Header X-Next-Cursor
+    function fetchUserPage(cursor) {
+        const url = cursor ? `/api/admin/users?cursor=${encodeURIComponent(cursor)}` : '/api/admin/users';
+        return fetch(url, { headers: getAuthHeaders() }).then(response => {
+            if (response.status === 401) {
+                showLogin();
+                throw new Error('Session abgelaufen. Bitte neu anmelden.');
+            }
+            if (!response.ok) {
+                throw new Error('Netzwerkfehler oder Server-Problem.');
+            }
+            const nextCursor = response.headers.get('X-Next-Cursor');
+            return response.json().then(users => ({ users, nextCursor }));
+        });
+    }
+
+    function appendUserRows(users) {
+        users.forEach(user => {
+            const row = document.createElement('tr');
+            row.innerHTML = `
+                <td>${user.username}</td>
+                <td>${user.role}</td>
+                <td class="actions">
+                    <button class="edit-btn" data-username="${user.username}" data-role="${user.role}">Bearbeiten</button>
+                    <button class="delete-btn" data-username="${user.username}">Löschen</button>
+                </td>
+            `;
+            userTableBody.appendChild(row);
+        });
+    }
+
+    // Es wird immer nur eine Seite geladen; weitere auf Klick ("Weitere laden")
+    let nextUserCursor = null;
+    let userListSeq = 0; // verwirft Seiten einer inzwischen neu geladenen Liste
+
+    function loadUserPage(cursor) {
+        const seq = userListSeq;
+        loadMoreUsersButton.disabled = true;
+        return fetchUserPage(cursor)
+            .then(({ users, nextCursor }) => {
+                if (seq !== userListSeq) {
+                    return;
+                }
+                appendUserRows(users);
+                nextUserCursor = nextCursor;
+                loadMoreUsersButton.style.display = nextCursor ? 'block' : 'none';
             })
             .catch(error => {
                 console.error('Fehler beim Laden der Benutzer:', error);
-                userTableBody.innerHTML = '<tr><td colspan="3">Benutzer konnten nicht geladen werden.</td></tr>';
+                if (seq === userListSeq && !cursor) {
+                    userTableBody.innerHTML = '<tr><td colspan="3">Benutzer konnten nicht geladen werden.</td></tr>';
+                } else if (seq === userListSeq) {
+                    alert('Weitere Benutzer konnten nicht geladen werden.');
+                }
+            })
+            .finally(() => {
+                loadMoreUsersButton.disabled = false;
             });
     }
 
+    function loadUsers() {
+        userListSeq++;
+        userTableBody.innerHTML = '';
+        nextUserCursor = null;
+        loadMoreUsersButton.style.display = 'none';
+        loadUserPage(null);
+    }
+
+    loadMoreUsersButton.addEventListener('click', () => {
+        if (nextUserCursor) {
+            loadUserPage(nextUserCursor);
+        }
+    });
+
     userTableBody.addEventListener('click', (e) => {
         const target = e.target;
         const username = target.dataset.username;
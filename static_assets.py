@@ -0,0 +1,187 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from functools import partial
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional; ohne brotli wird nur gzip angeboten
+    brotli = None
+
+# ==============================================================================
+# Vorab komprimierte Antworten mit Validierung (ETag / 304)
+# ==============================================================================
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+}
+# Sehr kleine Antworten werden durch Komprimierung nicht kleiner
+MIN_COMPRESS_SIZE = 256
+
+# Assets mit Versionsparameter (?v=...) ändern sich nie und dürfen lange im Cache bleiben
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    """Kodierungen aus Accept-Encoding, die nicht mit q=0 ausgeschlossen sind."""
+    accepted = set()
+    for item in header.split(","):
+        name, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip() and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _etag_matches(if_none_match: str | None, etags) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return not candidates.isdisjoint(etags)
+
+
+# Statische Dateien sind klein und werden einmal komprimiert: höchste Stufe.
+# Große, zur Laufzeit erzeugte Antworten (Katalog) mit mittlerer Stufe; Brotli 11
+# braucht dort ein Vielfaches der Zeit für wenige Prozent kleinere Antworten.
+STATIC_COMPRESSION = (11, 9)   # (Brotli-Qualität, gzip-Stufe)
+DYNAMIC_COMPRESSION = (5, 6)
+
+
+def _brotli(raw: bytes, quality: int) -> bytes:
+    return brotli.compress(raw, quality=quality)
+
+
+def _gzip(raw: bytes, level: int) -> bytes:
+    return gzip.compress(raw, compresslevel=level, mtime=0)
+
+
+class EncodedBody:
+    """
+    Ein Antwortinhalt, einmalig gehasht. Die komprimierten Fassungen werden beim
+    ersten Bedarf im Thread-Pool erzeugt (nie im Event-Loop) und danach
+    wiederverwendet, oder vorab mit warm_up().
+    """
+
+    def __init__(self, raw: bytes, media_type: str, compression: tuple[int, int] = STATIC_COMPRESSION):
+        self.media_type = media_type
+        digest = hashlib.sha256(raw).hexdigest()[:32]
+        self.version = digest[:12]
+        # Jede Kodierung ist eine eigene Repräsentation mit eigenem starken ETag
+        self.etags: dict[str | None, str] = {None: f'"{digest}"'}
+        self._compressors = {}
+        brotli_quality, gzip_level = compression
+        base_type = media_type.split(";")[0].strip()
+        if base_type in COMPRESSIBLE_TYPES and len(raw) >= MIN_COMPRESS_SIZE:
+            if brotli is not None:
+                self.etags["br"] = f'"{digest}-br"'
+                self._compressors["br"] = partial(_brotli, quality=brotli_quality)
+            self.etags["gzip"] = f'"{digest}-gz"'
+            self._compressors["gzip"] = partial(_gzip, level=gzip_level)
+        self._bodies: dict[str | None, bytes] = {None: raw}
+        self._lock = threading.Lock()
+
+    @property
+    def raw(self) -> bytes:
+        return self._bodies[None]
+
+    def body(self, encoding: str | None) -> bytes:
+        body = self._bodies.get(encoding)
+        if body is None:
+            # Gleichzeitige erste Anfragen warten auf dieselbe Komprimierung
+            with self._lock:
+                body = self._bodies.get(encoding)
+                if body is None:
+                    body = self._bodies[encoding] = self._compressors[encoding](self.raw)
+        return body
+
+    def warm_up(self):
+        for encoding in self.etags:
+            self.body(encoding)
+
+    async def response(self, request: Request, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response:
+        """Beantwortet die Anfrage mit 304 oder der besten vom Client akzeptierten Kodierung."""
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((name for name in ("br", "gzip") if name in self.etags and name in accepted), None)
+        headers = {"ETag": self.etags[encoding], "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        # Nur die ausgewählte Repräsentation zählt; ein ETag einer anderen Kodierung
+        # bestätigt nicht den Inhalt, den der Client jetzt bekäme
+        if _etag_matches(request.headers.get("if-none-match"), (self.etags[encoding],)):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        body = self._bodies.get(encoding)
+        if body is None:
+            body = await run_in_threadpool(self.body, encoding)
+        return Response(content=body, media_type=self.media_type, headers=headers)
+
+
+# ==============================================================================
+# Statische Dateien
+# ==============================================================================
+_STATIC_REF_RE = re.compile(r'((?:src|href)=")/static/([^"?#]+)(")')
+
+
+class StaticAssets:
+    """
+    Lädt alle Dateien eines Verzeichnisses beim Start, komprimiert sie beim ersten
+    Abruf (oder mit warm_up() vorab) und versieht Verweise in HTML-Seiten mit einem Inhalts-Hash (?v=...), damit
+    Browser sie dauerhaft zwischenspeichern können.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.files: dict[str, EncodedBody] = {}
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if name.startswith("."):
+                    continue
+                full_path = os.path.join(root, name)
+                rel_path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if media_type.startswith("text/") or media_type == "application/javascript":
+                    media_type += "; charset=utf-8"
+                with open(full_path, "rb") as f:
+                    self.files[rel_path] = EncodedBody(f.read(), media_type)
+
+    def warm_up(self):
+        """Komprimiert alle Dateien im Voraus (z.B. vor dem fork der Worker)."""
+        for asset in self.files.values():
+            asset.warm_up()
+
+    def get(self, path: str) -> EncodedBody | None:
+        return self.files.get(path)
+
+    def versioned_url(self, path: str) -> str:
+        asset = self.files.get(path)
+        return f"/static/{path}" if asset is None else f"/static/{path}?v={asset.version}"
+
+    def render_page(self, path: str) -> EncodedBody:
+        """Eine HTML-Seite mit versionierten Verweisen auf die statischen Dateien."""
+        html = self.files[path].raw.decode("utf-8")
+        html = _STATIC_REF_RE.sub(lambda m: m.group(1) + self.versioned_url(m.group(2)) + m.group(3), html)
+        return EncodedBody(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    async def response(self, request: Request, path: str) -> Response | None:
+        asset = self.files.get(path)
+        if asset is None:
+            return None
+        versioned = request.query_params.get("v") == asset.version
+        return await asset.response(request, IMMUTABLE_CACHE_CONTROL if versioned else REVALIDATE_CACHE_CONTROL)
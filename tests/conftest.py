@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Die Module liegen flach im Projektverzeichnis
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def metrics_dir(tmp_path_factory):
+    """Metrik-Dateien der Tests unter tmp_path statt in einem gemeinsamen Verzeichnis."""
+    from config import settings
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(settings, "METRICS_DIR", str(tmp_path_factory.mktemp("metrics")))
+        yield
@@ -0,0 +1,16 @@
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def test_cursor_round_trip():
+    for name in ("Worker000042", "müller", "a"):
+        assert main._decode_cursor(main._encode_cursor(name)) == name.lower()
+
+
+@pytest.mark.parametrize("cursor", ["%%%", "abc", "????", "ab=c", "ä"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        main._decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+import main
+from user_store import JsonUserStore
+
+
+@pytest.fixture(autouse=True)
+def users(tmp_path, monkeypatch):
+    store = JsonUserStore(str(tmp_path / "users.json"))
+    store.add_many(database._default_users())
+    monkeypatch.setattr(database, "_store", store)
+    monkeypatch.setattr(main, "login_ip_limiter", main.RateLimiter("login_ip", 0, 1))
+    monkeypatch.setattr(main, "login_user_limiter", main.RateLimiter("login_user", 0.001, 3))
+
+
+def _login(ip: str, password: str) -> int:
+    client = TestClient(main.app, client=(ip, 50000))
+    return client.post("/api/login", data={"username": "admin", "password": password}).status_code
+
+
+def test_failed_logins_do_not_lock_out_other_addresses():
+    assert [_login("10.0.0.9", "falsch") for _ in range(4)] == [401, 401, 401, 429]
+    assert _login("10.0.0.5", "Admin123") == 200
+
+
+def test_successful_login_resets_attempts():
+    assert [_login("10.0.0.7", "falsch") for _ in range(2)] == [401, 401]
+    assert _login("10.0.0.7", "Admin123") == 200
+    assert [_login("10.0.0.7", "falsch") for _ in range(3)] == [401, 401, 401]
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+import metrics
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _write_state(directory, name: str, pid: int, counter_value: float, gauge_value: float):
+    state = {"pid": pid, "metrics": {"test_total": [[["a"], counter_value]], "test_gauge": [[[], gauge_value]]}}
+    (directory / name).write_text(json.dumps(state), encoding="utf-8")
+
+
+def _registry(directory):
+    registry = metrics.Registry(str(directory))
+    counter = metrics.Counter("test_total", "Zähler.", ("label",), registry=registry)
+    gauge = metrics.Gauge("test_gauge", "Messwert.", registry=registry)
+    return registry, counter, gauge
+
+
+def test_dead_process_files_are_compacted(tmp_path):
+    registry, counter, gauge = _registry(tmp_path)
+    counter.inc(2, label="a")
+    gauge.set(1)
+    _write_state(tmp_path, "1-aaaa.json", _dead_pid(), 5, 7)
+    _write_state(tmp_path, "2-bbbb.json", _dead_pid(), 3, 9)
+
+    first = registry.render()
+    assert 'test_total{label="a"} 10' in first
+    # Gauges beendeter Prozesse zählen nicht
+    assert "test_gauge 1" in first
+    assert not (tmp_path / "1-aaaa.json").exists()
+    assert not (tmp_path / "2-bbbb.json").exists()
+    assert (tmp_path / metrics.AGGREGATE_FILE).exists()
+
+    # Weitere Abrufe und später beendete Prozesse zählen weiter, ohne doppelt zu zählen
+    assert 'test_total{label="a"} 10' in registry.render()
+    _write_state(tmp_path, "3-cccc.json", _dead_pid(), 1, 0)
+    assert 'test_total{label="a"} 11' in registry.render()
+    assert 'test_total{label="a"} 11' in registry.render()
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".json")] == [metrics.AGGREGATE_FILE]
+
+
+def test_interrupted_compaction_does_not_count_twice(tmp_path):
+    registry, counter, _ = _registry(tmp_path)
+    _write_state(tmp_path, "1-aaaa.json", _dead_pid(), 5, 0)
+    # Sammeldatei geschrieben, Datei aber noch nicht gelöscht
+    aggregate = {"pid": None, "metrics": {"test_total": [[["a"], 5]]}, "merged": ["1-aaaa.json"]}
+    (tmp_path / metrics.AGGREGATE_FILE).write_text(json.dumps(aggregate), encoding="utf-8")
+
+    assert 'test_total{label="a"} 5' in registry.render()
+    assert 'test_total{label="a"} 5' in registry.render()
+    assert not (tmp_path / "1-aaaa.json").exists()
+
+
+def test_without_directory_metrics_stay_in_process(tmp_path, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "METRICS_DIR", "")
+    monkeypatch.chdir(tmp_path)
+    registry = metrics.Registry()
+    counter = metrics.Counter("test_total", "Zähler.", ("label",), registry=registry)
+    counter.inc(2, label="a")
+    registry.flush()
+
+    assert registry.directory is None
+    assert 'test_total{label="a"} 2' in registry.render()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import database
+import main
+from user_store import JsonUserStore
+
+
+@pytest.fixture(autouse=True)
+def users(tmp_path, monkeypatch):
+    store = JsonUserStore(str(tmp_path / "users.json"))
+    store.add_many(database._default_users())
+    monkeypatch.setattr(database, "_store", store)
+
+
+def test_binary_frames_are_ignored():
+    with TestClient(main.app).websocket_connect("/ws/search") as websocket:
+        websocket.send_json({"token": main.create_access_token({"sub": "user"})})
+        assert websocket.receive_json() == {"type": "ready"}
+        websocket.send_bytes(b"\x00\x01")
+        websocket.send_json({"type": "search", "id": 1, "query": "E1"})
+        response = websocket.receive_json()
+        assert (response["type"], response["id"]) == ("results", 1)
+
+
+def test_binary_frame_instead_of_token_is_rejected():
+    with TestClient(main.app).websocket_connect("/ws/search") as websocket:
+        websocket.send_bytes(b"\x00\x01")
+        with pytest.raises(WebSocketDisconnect) as excinfo:
+            websocket.receive_json()
+        assert excinfo.value.code == main.WS_UNAUTHORIZED
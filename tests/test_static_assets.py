@@ -0,0 +1,32 @@
+import asyncio
+
+from starlette.requests import Request
+
+from static_assets import EncodedBody
+
+
+def _request(headers: dict) -> Request:
+    raw_headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": raw_headers})
+
+
+def _respond(body: EncodedBody, headers: dict):
+    return asyncio.run(body.response(_request(headers)))
+
+
+BODY = EncodedBody(b'{"errors": "' + b"x" * 1000 + b'"}', "application/json")
+
+
+def test_etag_of_selected_encoding_gives_304():
+    response = _respond(BODY, {"Accept-Encoding": "gzip", "If-None-Match": BODY.etags["gzip"]})
+    assert response.status_code == 304
+    assert response.headers["etag"] == BODY.etags["gzip"]
+
+
+def test_etag_of_other_encoding_sends_full_body():
+    # Ein zwischengespeicherter gzip-Inhalt passt nicht zu einer Antwort ohne Kodierung
+    response = _respond(BODY, {"Accept-Encoding": "identity", "If-None-Match": BODY.etags["gzip"]})
+    assert response.status_code == 200
+    assert response.headers["etag"] == BODY.etags[None]
+    assert response.body == BODY.raw
+    assert "content-encoding" not in response.headers
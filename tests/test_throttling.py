@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+import main
+from throttling import LoadShedder, RateLimiter
+from user_store import JsonUserStore
+
+
+@pytest.fixture
+def users(tmp_path, monkeypatch):
+    store = JsonUserStore(str(tmp_path / "users.json"))
+    store.add_many(database._default_users())
+    monkeypatch.setattr(database, "_store", store)
+
+
+def _search(ip: str, username: str):
+    client = TestClient(main.app, client=(ip, 50000))
+    token = main.create_access_token({"sub": username})
+    return client.get("/api/search_errors", params={"query": "E1"}, headers={"Authorization": f"Bearer {token}"})
+
+
+def test_rate_limiter_allows_burst_then_reports_wait():
+    limiter = RateLimiter("test", rate=2.0, burst=3)
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert 0 < limiter.acquire("a") <= 0.5
+    # Jeder Schlüssel hat einen eigenen Vorrat
+    assert limiter.acquire("b") == 0.0
+    limiter.reset("a")
+    assert limiter.acquire("a") == 0.0
+
+
+def test_rate_limiter_evicts_least_recently_used():
+    limiter = RateLimiter("test", rate=0.001, burst=1, maxsize=2)
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("b") == 0.0
+    assert limiter.acquire("c") == 0.0
+    # "a" wurde verdrängt und beginnt wieder mit vollem Bucket, "c" nicht
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("c") > 0
+
+
+def test_load_shedder_rejects_with_retry_after_except_exempt_paths():
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    responses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            responses.append((message["status"], dict(message["headers"])))
+
+    shedder = LoadShedder(endpoint, max_in_flight=1, retry_after=2)
+    scope = {"type": "http", "method": "GET", "path": "/api/search_errors", "headers": []}
+    asyncio.run(shedder(scope, receive, send))
+    shedder.in_flight = 1
+    asyncio.run(shedder(scope, receive, send))
+    asyncio.run(shedder(dict(scope, path="/health"), receive, send))
+
+    assert [status for status, _ in responses] == [200, 503, 200]
+    assert responses[1][1][b"retry-after"] == b"2"
+
+
+def test_search_is_limited_per_user(users, monkeypatch):
+    monkeypatch.setattr(main, "search_ip_limiter", RateLimiter("search_ip", 0, 1))
+    monkeypatch.setattr(main, "search_user_limiter", RateLimiter("search_user", 0.001, 2))
+
+    assert [_search("10.0.0.1", "admin").status_code for _ in range(2)] == [200, 200]
+    # Eine andere Adresse hilft demselben Benutzer nicht
+    response = _search("10.0.0.2", "admin")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert _search("10.0.0.1", "user").status_code == 200
+
+
+def test_search_is_limited_per_address(users, monkeypatch):
+    monkeypatch.setattr(main, "search_ip_limiter", RateLimiter("search_ip", 0.001, 2))
+    monkeypatch.setattr(main, "search_user_limiter", RateLimiter("search_user", 0, 1))
+
+    assert [_search("10.0.0.1", name).status_code for name in ("admin", "user")] == [200, 200]
+    assert _search("10.0.0.1", "admin").status_code == 429
+    assert _search("10.0.0.2", "admin").status_code == 200
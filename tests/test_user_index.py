@@ -0,0 +1,155 @@
+import json
+import os
+import signal
+
+import pytest
+
+import database
+from config import settings
+from database import UserInDB
+from user_store import JsonUserStore, SqliteUserStore
+
+# Ein fester Hash genügt; bcrypt ist nicht Gegenstand dieser Tests
+HASH = "$2b$12$KIXQJQ6y0B2g5Ohy8Vd2UeC6p1CQ6pV1u5tQd0r1rj4k0o6HjvG2y"
+
+
+def _record(username: str, role: str = "user") -> dict:
+    return {
+        "username": username, "full_name": None, "email": None,
+        "hashed_password": HASH, "role": role, "disabled": False,
+    }
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path, monkeypatch):
+    """Ein leeres Backend mit 100 Benutzern als database._store."""
+    if request.param == "sqlite":
+        user_store = SqliteUserStore(str(tmp_path / "users.db"))
+    else:
+        user_store = JsonUserStore(str(tmp_path / "users.json"))
+    user_store.add_many([_record(f"Worker{i:06d}") for i in range(100)])
+    monkeypatch.setattr(database, "_store", user_store)
+    yield user_store
+    user_store.close()
+
+
+def test_get_ignores_case(store):
+    assert database.get_user("worker000042").username == "Worker000042"
+    assert database.get_user("WORKER000042").username == "Worker000042"
+    assert database.get_user("nobody") is None
+
+
+def test_add_rejects_duplicate_in_other_case(store):
+    assert not database.add_user(UserInDB(username="WORKER000001", hashed_password=HASH, role="user"))
+    assert database.get_user("worker000001").username == "Worker000001"
+    assert store.count() == 100
+
+
+def test_add_keeps_spelling(store):
+    assert database.add_user(UserInDB(username="NewHire", hashed_password=HASH, role="user"))
+    assert database.get_user("newhire").username == "NewHire"
+
+
+def test_add_users_skips_existing_and_repeated(store):
+    users = [UserInDB(username=name, hashed_password=HASH, role="user") for name in ("Anna", "ANNA", "worker000003", "Bert")]
+    assert database.add_users(users) == ["Anna", "Bert"]
+    assert database.get_user("anna").username == "Anna"
+
+
+def test_update_ignores_case(store):
+    assert database.add_user(UserInDB(username="NewHire", hashed_password=HASH, role="user"))
+    assert database.update_user_data("NEWHIRE", {"new_role": "admin", "disabled": True})
+    user = database.get_user("newhire")
+    assert (user.username, user.role, user.disabled) == ("NewHire", "admin", True)
+    assert not database.update_user_data("nobody", {"new_role": "admin"})
+
+
+def test_delete_then_add_again(store):
+    assert database.add_user(UserInDB(username="NewHire", hashed_password=HASH, role="user"))
+    assert database.delete_user("newHIRE")
+    assert database.get_user("NewHire") is None
+    assert not database.delete_user("NewHire")
+    assert database.add_user(UserInDB(username="newhire", hashed_password=HASH, role="user"))
+    assert database.get_user("NEWHIRE").username == "newhire"
+
+
+def test_page_follows_index(store):
+    assert database.delete_user("worker000001")
+    page = database.get_users_page(None, 3)
+    assert [user.username for user in page] == ["Worker000000", "Worker000002", "Worker000003"]
+    page = database.get_users_page("WORKER000098", 10)
+    assert [user.username for user in page] == ["Worker000099"]
+
+
+def test_load_db_rebuilds_index_with_legacy_names(tmp_path, monkeypatch):
+    # Altbestand: gleiche Namen in anderer Schreibweise; der erste Eintrag gilt
+    path = tmp_path / "users.json"
+    legacy = {name: _record(name, role) for name, role in (("Max", "admin"), ("max", "user"), ("Erika", "user"))}
+    path.write_text(json.dumps(legacy), encoding="utf-8")
+    monkeypatch.setattr(settings, "USER_STORE", "json")
+    monkeypatch.setattr(settings, "USER_DB_FLUSH_DELAY", 0)
+    monkeypatch.setattr(database, "DB_FILE", str(path))
+    monkeypatch.setattr(database, "_store", None)
+
+    database._load_db()
+
+    assert database.get_user("MAX").username == "Max"
+    assert database.get_user("max").role == "admin"
+    assert database.get_user("erika").username == "Erika"
+    assert not database.add_user(UserInDB(username="MAX", hashed_password=HASH, role="user"))
+
+    # Löschen macht die nächste Schreibweise sichtbar, wie ein Neuladen der Datei
+    assert database.delete_user("max")
+    assert database.get_user("MAX").username == "max"
+    assert database.get_user("max").role == "user"
+    assert database.delete_user("MAX")
+    assert database.get_user("Max") is None
+    assert database.add_user(UserInDB(username="MAX", hashed_password=HASH, role="admin"))
+    assert database.get_user("max").username == "MAX"
+
+    # Nach einem Neustart gilt derselbe Stand; keine alten Datensätze tauchen wieder auf
+    database._get_store().flush()
+    reopened = JsonUserStore(str(path))
+    assert reopened.get("max")["username"] == "MAX"
+    assert reopened.get("max")["role"] == "admin"
+    assert reopened.get("erika")["username"] == "Erika"
+    assert sorted(json.loads(path.read_text(encoding="utf-8"))) == ["Erika", "MAX"]
+
+
+def test_incomplete_backend_fails_on_creation():
+    from user_store import UserStore
+
+    class OnlyGet(UserStore):
+        def get(self, username):
+            return None
+
+    with pytest.raises(TypeError):
+        OnlyGet()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="nur mit fork")
+def test_child_gets_fresh_locks_after_fork(tmp_path):
+    # Wie gunicorn --preload: der Elternprozess hält beim fork gerade eine Sperre
+    store = JsonUserStore(str(tmp_path / "users.json"), flush_delay=0.01)
+    with store._write_lock, store._lock:
+        pid = os.fork()
+        if pid == 0:
+            signal.alarm(5)
+            store.add(_record("Kind"))
+            store.flush()
+            os._exit(0)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert "Kind" in json.loads((tmp_path / "users.json").read_text(encoding="utf-8"))
+
+
+def test_warm_up_closes_sqlite_connections(tmp_path, monkeypatch):
+    user_store = SqliteUserStore(str(tmp_path / "users.db"), check_interval=0.001)
+    user_store.add_many([_record("Anna")])
+    user_store.check_for_changes()
+    monkeypatch.setattr(database, "_store", user_store)
+
+    database.warm_up()
+
+    assert user_store._local.conn is None and user_store._watch is None
+    assert database.get_user("anna").username == "Anna"
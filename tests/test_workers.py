@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+CHECK_WORKERS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "check_workers.py")
+
+
+@pytest.mark.parametrize("store", ["json", "sqlite"])
+def test_user_changes_reach_all_workers(store, tmp_path):
+    # Eigener Prozess: die Einstellungen (Pfade, Intervalle) werden beim Import gelesen
+    result = subprocess.run(
+        [sys.executable, CHECK_WORKERS, "--workers", "3", "--store", store, "--sync-interval", "0.2", "--flush-delay", "0.1",
+         "--directory", str(tmp_path)],
+        cwd=tmp_path, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
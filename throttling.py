@@ -0,0 +1,105 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+# ==============================================================================
+# Token-Bucket pro Client (Benutzer oder IP)
+# ==============================================================================
+class RateLimiter:
+    """
+    Token-Bucket je Schlüssel: pro Sekunde kommen rate Tokens hinzu, höchstens
+    burst sind angespart; jede Anfrage verbraucht eines. Die Buckets leben im
+    Speicher des Workers, die Grenzen gelten also pro Prozess. Es werden
+    höchstens maxsize Schlüssel gehalten (LRU); ein verdrängter Schlüssel
+    beginnt wieder mit vollem Bucket.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, maxsize: int = 100000):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.maxsize = maxsize
+        self._buckets: OrderedDict = OrderedDict()  # key -> (tokens, Zeitpunkt)
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Nimmt ein Token; liefert 0.0 oder die Wartezeit in Sekunden bis zum nächsten."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(self.burst)
+            else:
+                self._buckets.move_to_end(key)
+                tokens = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+        metrics.RATE_LIMITED.inc(limiter=self.name)
+        return (1 - tokens) / self.rate
+
+    def reset(self, key: str):
+        """Vergisst den Bucket eines Schlüssels (danach wieder voller Vorrat)."""
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+def retry_after_header(seconds: float) -> dict:
+    """Retry-After in ganzen Sekunden (mindestens 1)."""
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+# ==============================================================================
+# Lastabwurf bei zu vielen gleichzeitigen Anfragen
+# ==============================================================================
+class LoadShedder:
+    """
+    Reine ASGI-Middleware: sind bereits max_in_flight Anfragen in Bearbeitung,
+    wird jede weitere sofort mit 503 und Retry-After beantwortet, statt die
+    Wartezeit für alle zu verlängern. exempt_paths (Health-Check, Metriken)
+    werden immer bearbeitet.
+    """
+
+    def __init__(self, app, max_in_flight: int, exempt_paths=("/health", "/metrics"), retry_after: int = 1):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.exempt_paths = frozenset(exempt_paths)
+        self.retry_after = retry_after
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_in_flight <= 0 or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        if self.in_flight >= self.max_in_flight:
+            metrics.SHED_REQUESTS.inc()
+            await self._reject(send)
+            return
+        # Alle Anfragen eines Workers laufen im selben Event-Loop; ein Zähler genügt
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Server busy, please retry shortly"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(self.retry_after).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,616 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from bisect import bisect_right, insort
+from contextlib import contextmanager
+
+from metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # nicht unter Windows; dann ohne Sperre zwischen Prozessen
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# Speicher-Schnittstelle für Benutzer
+# ==============================================================================
+# Ein Benutzer wird als dict mit den Feldern aus database.UserInDB gespeichert.
+# Benutzernamen sind unabhängig von Groß-/Kleinschreibung eindeutig; gespeichert
+# bleibt die Schreibweise bei der Anlage.
+USER_FIELDS = ("username", "email", "full_name", "disabled", "role", "hashed_password")
+
+
+class UserStore(ABC):
+    """Gemeinsame Schnittstelle aller Speicher-Backends."""
+
+    @abstractmethod
+    def get(self, username: str) -> dict | None:
+        """Liefert den Datensatz zu einem Benutzernamen (Groß-/Kleinschreibung egal)."""
+
+    def add(self, record: dict) -> bool:
+        """Legt einen Benutzer an; False, wenn der Name bereits vergeben ist."""
+        return bool(self.add_many([record]))
+
+    @abstractmethod
+    def add_many(self, records: list[dict]) -> list[str]:
+        """Legt mehrere Benutzer an und liefert die Namen der tatsächlich angelegten."""
+
+    @abstractmethod
+    def update(self, username: str, changes: dict) -> str | None:
+        """Ändert Felder eines Benutzers; liefert den gespeicherten Namen oder None."""
+
+    @abstractmethod
+    def delete(self, username: str) -> str | None:
+        """Löscht einen Benutzer; liefert den gespeicherten Namen oder None."""
+
+    @abstractmethod
+    def all(self) -> list[dict]:
+        """Alle Benutzer."""
+
+    @abstractmethod
+    def page(self, after: str | None, limit: int) -> list[dict]:
+        """
+        Bis zu limit Benutzer, sortiert nach kleingeschriebenem Namen und beginnend
+        nach dem Namen after (Keyset-Pagination).
+        """
+
+    @abstractmethod
+    def iter_snapshot(self):
+        """
+        Iteriert alle Benutzer eines festen Zeitpunkts. Spätere Änderungen sind
+        nicht sichtbar, auch wenn der Iterator lange läuft.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Anzahl der Benutzer."""
+
+    def check_for_changes(self) -> bool:
+        """
+        Prüft (gedrosselt), ob ein anderer Prozess Benutzer geändert hat, und
+        übernimmt diese Änderungen. True, wenn seit dem letzten Aufruf etwas
+        von außen hinzugekommen ist.
+        """
+        return False
+
+    def flush(self):
+        """Schreibt ausstehende Änderungen sofort (nur für verzögert schreibende Backends)."""
+
+    def close(self):
+        self.flush()
+
+    def _after_fork_in_child(self):
+        """Ersetzt Sperren, die der Elternprozess beim fork gerade halten konnte."""
+
+
+# Alle geöffneten Speicher; nach einem fork (gunicorn --preload) erhalten sie im
+# Kind neue Sperren, denn eine im Elternprozess gehaltene würde dort nie frei
+_open_stores = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for store in list(_open_stores):
+        store._after_fork_in_child()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+# ==============================================================================
+# JSON-Datei (für kleine Installationen)
+# ==============================================================================
+def atomic_write(path: str, data: bytes):
+    """
+    Schreibt eine Datei absturzsicher: erst in eine temporäre Datei im selben
+    Verzeichnis, fsync, dann os.replace. Leser sehen immer entweder den alten
+    oder den neuen vollständigen Inhalt.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Auch den Verzeichniseintrag dauerhaft machen (nicht auf allen Systemen möglich)
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def _stat_stamp(st: os.stat_result) -> tuple:
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+@contextmanager
+def _interprocess_lock(path: str):
+    """Exklusive Sperre über eine Lock-Datei, gemeinsam für alle Prozesse (flock)."""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # Schließen gibt die Sperre frei
+        os.close(fd)
+
+
+def _build_index(users: dict) -> tuple[dict, list]:
+    """Namensindex (kleingeschrieben -> Schlüssel in users) und sortierte Namensliste."""
+    index = {}
+    for db_username in users:
+        # Bei Altbeständen mit gleichen Namen in anderer Schreibweise gilt der erste Eintrag
+        index.setdefault(db_username.lower(), db_username)
+    return index, sorted(index)
+
+
+def _apply_change(users: dict, index: dict, sorted_keys: list, change: tuple) -> str | None:
+    """
+    Wendet eine Änderung ("add" | "update" | "delete", Name klein, Daten) an;
+    liefert den betroffenen gespeicherten Namen oder None, wenn sie nicht greift.
+    """
+    kind, key, data = change
+    if kind == "add":
+        if key in index:
+            return None
+        users[data["username"]] = data
+        index[key] = data["username"]
+        insort(sorted_keys, key)
+        return data["username"]
+    db_username = index.get(key)
+    if db_username is None:
+        return None
+    if kind == "update":
+        # Datensätze werden ersetzt statt verändert, damit Leser nie einen halb
+        # geänderten Stand sehen
+        users[db_username] = {**users[db_username], **data}
+    else:
+        del users[db_username]
+        # Altbestände können weitere Schreibweisen desselben Namens enthalten (dann
+        # gibt es mehr Datensätze als Indexeinträge); der nächste wird sichtbar, wie
+        # nach einem Neuladen der Datei, statt verborgen mitgespeichert zu werden
+        variant = None
+        if len(users) > len(index) - 1:
+            variant = next((name for name in users if name.lower() == key), None)
+        if variant is not None:
+            index[key] = variant
+        else:
+            del index[key]
+            del sorted_keys[bisect_right(sorted_keys, key) - 1]
+    return db_username
+
+
+class JsonUserStore(UserStore):
+    """
+    Hält alle Benutzer im Speicher und schreibt die ganze Datei atomar.
+
+    Mit flush_delay > 0 wird verzögert im Hintergrund geschrieben: alle
+    Änderungen innerhalb dieses Zeitfensters ergeben zusammen einen einzigen
+    Schreibvorgang. Bei einem Absturz gehen höchstens die Änderungen der
+    letzten flush_delay Sekunden verloren, die Datei bleibt aber immer gültig.
+
+    Mehrere Prozesse (gunicorn-Worker) können dieselbe Datei nutzen: Schreiben
+    geschieht unter einer Dateisperre, und eine zwischenzeitlich von einem
+    anderen Prozess geschriebene Datei wird vorher übernommen und um die eigenen
+    Änderungen ergänzt. Mit check_interval > 0 prüft check_for_changes() in
+    diesem Abstand die Datei (nur os.stat) und lädt sie bei Bedarf neu.
+    """
+
+    def __init__(self, path: str, flush_delay: float = 0, check_interval: float = 0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.check_interval = check_interval
+        self._lock_path = f"{path}.lock"
+        self._lock = threading.RLock()
+        # Änderungszähler: _generation wird bei jeder Änderung erhöht,
+        # _saved_generation ist der Stand der Datei
+        self._generation = 0
+        self._saved_generation = 0
+        # Eigene Änderungen, die noch nicht in der Datei stehen
+        self._pending: list[tuple] = []
+        self._write_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._flusher_pid = None
+        self._next_check = 0.0
+        self._reloaded = False
+        users, self._stamp = self._read_file()
+        # (Benutzer, Index, sortierte Namen) als ein Wert, den _reload auf einmal
+        # austauscht; Leser ohne Sperre lesen ihn einmal und sehen so nie Index und
+        # Daten aus verschiedenen Ständen. Index: kleingeschriebener Name -> Schlüssel
+        self._state: tuple[dict[str, dict], dict, list] = (users, *_build_index(users))
+        if flush_delay > 0:
+            atexit.register(self.flush)
+        _open_stores.add(self)
+
+    def _after_fork_in_child(self):
+        # Der Schreib-Thread des Elternprozesses existiert hier nicht; _save startet einen eigenen
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._dirty = threading.Event()
+
+    def _read_file(self) -> tuple[dict, tuple | None]:
+        """Inhalt und Stempel der Datei; ({}, None), wenn sie (noch) nicht existiert."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stamp = _stat_stamp(os.fstat(f.fileno()))
+                return json.load(f), stamp
+        except FileNotFoundError:
+            return {}, None
+
+    def _file_changed(self) -> bool:
+        """True, wenn die Datei nicht mehr dem zuletzt gelesenen oder geschriebenen Stand entspricht."""
+        try:
+            return _stat_stamp(os.stat(self.path)) != self._stamp
+        except FileNotFoundError:
+            return False
+
+    def _reload(self):
+        """Übernimmt die Datei eines anderen Prozesses und wendet eigene ausstehende Änderungen erneut an."""
+        users, stamp = self._read_file()
+        index, sorted_keys = _build_index(users)
+        with self._lock:
+            for change in self._pending:
+                _apply_change(users, index, sorted_keys, change)
+            self._state = (users, index, sorted_keys)
+            self._stamp = stamp
+            self._reloaded = True
+        logger.info("%s changed by another process, reloaded (%d users)", self.path, len(users))
+
+    def check_for_changes(self) -> bool:
+        if self.check_interval > 0:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._next_check = now + self.check_interval
+                # Während eines Schreibvorgangs nicht prüfen; flush() übernimmt
+                # fremde Änderungen selbst
+                if self._write_lock.acquire(blocking=False):
+                    try:
+                        if self._file_changed():
+                            self._reload()
+                    finally:
+                        self._write_lock.release()
+        reloaded, self._reloaded = self._reloaded, False
+        return reloaded
+
+    def _save(self):
+        """
+        Schreibt nach einer Änderung sofort oder beauftragt den Hintergrund-Thread.
+        Wird außerhalb von _lock aufgerufen; die Änderung selbst erhöht _generation.
+        """
+        if self.flush_delay <= 0:
+            self.flush()
+            return
+        if self._flusher_pid != os.getpid():
+            # Threads überleben keinen fork; pro Prozess einen eigenen starten
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name="user-store-flush", daemon=True).start()
+        self._dirty.set()
+
+    def _flush_loop(self):
+        while True:
+            self._dirty.wait()
+            # Weitere Änderungen im Zeitfenster werden mit diesem Schreibvorgang erfasst
+            time.sleep(self.flush_delay)
+            self._dirty.clear()
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Writing %s failed, retrying", self.path)
+                self._dirty.set()
+
+    def flush(self):
+        """Schreibt den aktuellen Stand, falls er noch nicht in der Datei steht."""
+        with self._write_lock:
+            if self._generation == self._saved_generation:
+                return
+            with _interprocess_lock(self._lock_path):
+                # Hat ein anderer Prozess inzwischen geschrieben, dessen Stand übernehmen,
+                # damit seine Änderungen nicht überschrieben werden
+                if self._file_changed():
+                    self._reload()
+                with self._lock:
+                    generation = self._generation
+                    written = len(self._pending)
+                    # Datensätze werden nie verändert, nur ersetzt; eine flache Kopie
+                    # ist daher ein konsistenter Stand
+                    snapshot = dict(self._state[0])
+                with timed("save_db"):
+                    atomic_write(self.path, json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+                stamp = _stat_stamp(os.stat(self.path))
+            with self._lock:
+                self._saved_generation = generation
+                del self._pending[:written]
+                self._stamp = stamp
+
+    def _change(self, change: tuple) -> str | None:
+        """Wendet eine eigene Änderung an und merkt sie zum Schreiben vor (unter _lock aufrufen)."""
+        db_username = _apply_change(*self._state, change)
+        if db_username is not None:
+            self._pending.append(change)
+            self._generation += 1
+        return db_username
+
+    def get(self, username):
+        users, index, _ = self._state
+        db_username = index.get(username.lower())
+        # .get: ein gleichzeitiges Löschen entfernt den Datensatz vor dem Indexeintrag
+        return None if db_username is None else users.get(db_username)
+
+    def add_many(self, records):
+        added = []
+        with self._lock:
+            for record in records:
+                if self._change(("add", record["username"].lower(), dict(record))) is not None:
+                    added.append(record["username"])
+        if added:
+            self._save()
+        return added
+
+    def update(self, username, changes):
+        with self._lock:
+            db_username = self._change(("update", username.lower(), dict(changes)))
+        if db_username is not None:
+            self._save()
+        return db_username
+
+    def delete(self, username):
+        with self._lock:
+            db_username = self._change(("delete", username.lower(), None))
+        if db_username is not None:
+            self._save()
+        return db_username
+
+    def all(self):
+        return list(self._state[0].values())
+
+    def page(self, after, limit):
+        with self._lock:
+            users, index, sorted_keys = self._state
+            start = 0 if after is None else bisect_right(sorted_keys, after.lower())
+            return [users[index[key]] for key in sorted_keys[start:start + limit]]
+
+    def iter_snapshot(self):
+        # Datensätze werden nur ersetzt, nie verändert: die Liste der Verweise
+        # ist ein vollständiger Stand, ohne die Daten selbst zu kopieren
+        with self._lock:
+            records = list(self._state[0].values())
+        return iter(records)
+
+    def count(self):
+        return len(self._state[0])
+
+
+# ==============================================================================
+# SQLite mit WAL (mehrere Prozesse, inkrementelle Änderungen)
+# ==============================================================================
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username_key    TEXT PRIMARY KEY,
+    username        TEXT NOT NULL,
+    email           TEXT,
+    full_name       TEXT,
+    disabled        INTEGER,
+    role            TEXT NOT NULL,
+    hashed_password TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def _row_to_record(row) -> dict:
+    record = dict(zip(USER_FIELDS, row))
+    if record["disabled"] is not None:
+        record["disabled"] = bool(record["disabled"])
+    return record
+
+
+def _record_to_row(record: dict) -> tuple:
+    return (record["username"].lower(),) + tuple(record.get(field) for field in USER_FIELDS)
+
+
+class SqliteUserStore(UserStore):
+    """
+    Benutzer in einer SQLite-Datenbank im WAL-Modus. Jede Änderung betrifft nur
+    die eigene Zeile; mehrere gunicorn-Worker können dieselbe Datei nutzen.
+    Gelesen wird immer aus der Datenbank; check_for_changes() meldet lediglich,
+    dass andere Verbindungen geschrieben haben (PRAGMA data_version).
+    """
+
+    _COLUMNS = ", ".join(USER_FIELDS)
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000, check_interval: float = 0):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.check_interval = check_interval
+        self._next_check = 0.0
+        self._watch = None  # (pid, Verbindung, zuletzt gesehene data_version)
+        self._watch_lock = threading.Lock()
+        # Eine Verbindung pro Thread und Prozess; sqlite3-Verbindungen dürfen
+        # weder zwischen Threads geteilt noch über fork vererbt werden
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(_SCHEMA)
+        _open_stores.add(self)
+
+    def _after_fork_in_child(self):
+        self._watch_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def check_for_changes(self):
+        if self.check_interval <= 0:
+            return False
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        with self._watch_lock:
+            # Eigene Verbindung pro Prozess nur für diese Prüfung: data_version ändert
+            # sich, sobald eine andere Verbindung schreibt (auch aus diesem Prozess)
+            if self._watch is None or self._watch[0] != os.getpid():
+                conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+                self._watch = (os.getpid(), conn, conn.execute("PRAGMA data_version").fetchone()[0])
+                return False
+            pid, conn, known_version = self._watch
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == known_version:
+                return False
+            self._watch = (pid, conn, version)
+            return True
+
+    def get(self, username):
+        row = self._connection().execute(
+            f"SELECT {self._COLUMNS} FROM users WHERE username_key = ?", (username.lower(),)
+        ).fetchone()
+        return None if row is None else _row_to_record(row)
+
+    def add_many(self, records):
+        added = []
+        with self._write_transaction() as conn:
+            for record in records:
+                cursor = conn.execute(
+                    f"INSERT INTO users (username_key, {self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(username_key) DO NOTHING",
+                    _record_to_row(record),
+                )
+                if cursor.rowcount:
+                    added.append(record["username"])
+        return added
+
+    @contextmanager
+    def _write_transaction(self):
+        """Schreibtransaktion, die von Anfang an die Schreibsperre hält (BEGIN IMMEDIATE)."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _stored_username(self, conn: sqlite3.Connection, key: str) -> str | None:
+        row = conn.execute("SELECT username FROM users WHERE username_key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    # SELECT und Änderung in einer Transaktion statt UPDATE/DELETE ... RETURNING,
+    # das erst ab SQLite 3.35 verfügbar ist (z.B. nicht unter Debian 11)
+    def update(self, username, changes):
+        fields = [field for field in changes if field in USER_FIELDS and field != "username"]
+        key = username.lower()
+        if not fields:
+            return self._stored_username(self._connection(), key)
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        with self._write_transaction() as conn:
+            db_username = self._stored_username(conn, key)
+            if db_username is not None:
+                conn.execute(
+                    f"UPDATE users SET {assignments} WHERE username_key = ?",
+                    [changes[field] for field in fields] + [key],
+                )
+        return db_username
+
+    def delete(self, username):
+        key = username.lower()
+        with self._write_transaction() as conn:
+            db_username = self._stored_username(conn, key)
+            if db_username is not None:
+                conn.execute("DELETE FROM users WHERE username_key = ?", (key,))
+        return db_username
+
+    def all(self):
+        rows = self._connection().execute(f"SELECT {self._COLUMNS} FROM users ORDER BY username_key")
+        return [_row_to_record(row) for row in rows]
+
+    def page(self, after, limit):
+        rows = self._connection().execute(
+            f"SELECT {self._COLUMNS} FROM users WHERE username_key > ? ORDER BY username_key LIMIT ?",
+            ("" if after is None else after.lower(), limit),
+        )
+        return [_row_to_record(row) for row in rows]
+
+    def iter_snapshot(self, batch_size: int = 500):
+        # Eigene Verbindung mit offener Lesetransaktion: WAL liefert bis zum Ende
+        # denselben Stand, während andere Verbindungen weiter schreiben. Der
+        # Iterator kann von wechselnden Threads weitergeführt werden.
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+        try:
+            conn.execute("BEGIN")
+            cursor = conn.execute(f"SELECT {self._COLUMNS} FROM users ORDER BY username_key")
+            while rows := cursor.fetchmany(batch_size):
+                for row in rows:
+                    yield _row_to_record(row)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        with self._watch_lock:
+            if self._watch is not None and self._watch[0] == os.getpid():
+                self._watch[1].close()
+            self._watch = None
+
+
+# ==============================================================================
+# Migration
+# ==============================================================================
+def migrate_json_to_sqlite(json_path: str, sqlite_path: str) -> int:
+    """
+    Übernimmt alle Benutzer aus einer users.json in die SQLite-Datenbank.
+    Bereits vorhandene Namen werden übersprungen; liefert die Anzahl neuer Benutzer.
+    """
+    source = JsonUserStore(json_path)
+    target = SqliteUserStore(sqlite_path)
+    try:
+        return len(target.add_many(source.all()))
+    finally:
+        target.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benutzer aus users.json in eine SQLite-Datenbank übernehmen.")
+    parser.add_argument("json_path")
+    parser.add_argument("sqlite_path")
+    args = parser.parse_args()
+    print(f"{migrate_json_to_sqlite(args.json_path, args.sqlite_path)} Benutzer übernommen.")